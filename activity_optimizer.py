@@ -0,0 +1,175 @@
+import heapq
+import math
+import time
+from keyword_index import terms
+
+# Every affordable activity is worth a little, so leftover budget still buys something
+BASE_SCORE = 0.1
+
+# Exact DP runs while activities * slots * capacity cells stays within this many cells
+DP_CELL_LIMIT = 300_000
+# Finest price step the DP distinguishes, and the fewest capacity cells worth running it with
+PRICE_RESOLUTION = 0.01
+MIN_CAPACITY_CELLS = 200
+
+# Default wall-clock budget, in seconds, for improving the heuristic answer on large catalogs
+DEFAULT_TIME_BUDGET = 0.05
+# Items the heuristic considers on large catalogs: this many best by score per price,
+# plus this many best by score
+HEURISTIC_CANDIDATES = 1024
+
+# Fields activity_text reads; changes to any other field leave the matching unchanged
+TEXT_FIELDS = frozenset({"name", "tags"})
+
+def activity_text(activity):
+    """Text an activity is matched on: its name and tags."""
+    return " ".join([activity["name"], *activity.get("tags", ())])
+
+def preference_score(activity, preference_terms):
+    """Score an activity by how many preference terms (from keyword_index.terms) it matches."""
+    return BASE_SCORE + len(preference_terms & terms(activity_text(activity)))
+
+def optimize_activities(activities, budget, preferences, max_activities=None,
+                        time_budget=DEFAULT_TIME_BUDGET, match_counts=None):
+    """Pick the activities with the highest total preference score whose prices fit the budget.
+
+    This is a 0/1 knapsack, optionally capped at max_activities items. Small catalogs are
+    solved exactly with dynamic programming; large ones use a greedy score-per-price fill
+    improved by swaps until time_budget seconds have passed. match_counts, if given, maps
+    positions in activities to their number of matched preference terms (as returned by
+    KeywordIndex.matches) and saves matching every activity here. Returns activities in
+    catalogue order.
+    """
+    if match_counts is None:
+        preference_terms = terms(preferences)
+        scores = [preference_score(activity, preference_terms) for activity in activities]
+    else:
+        scores = [BASE_SCORE + match_counts.get(i, 0) for i in range(len(activities))]
+    prices = [activity["price"] for activity in activities]
+    chosen = select_items(prices, scores, budget, max_activities, time_budget)
+    return [activities[i] for i in sorted(chosen)]
+
+def select_items(prices, scores, budget, max_items=None, time_budget=DEFAULT_TIME_BUDGET):
+    """Return indexes of the items maximising total score with total price <= budget."""
+    # Only items that are affordable on their own and worth something can be picked
+    candidates = [i for i, (price, score) in enumerate(zip(prices, scores)) if price <= budget and score > 0]
+    if not candidates or max_items == 0:
+        return []
+    chosen = _select(
+        [prices[i] for i in candidates], [scores[i] for i in candidates], budget, max_items, time_budget
+    )
+    return [candidates[i] for i in chosen]
+
+def _select(prices, scores, budget, max_items, time_budget):
+    n = len(prices)
+    slots = max_items if max_items is not None and max_items < n else None
+
+    # Everything fits: no search needed
+    if slots is None and sum(prices) <= budget:
+        return list(range(n))
+
+    capacity = int(budget / PRICE_RESOLUTION + 1e-9)
+    capacity = min(capacity, DP_CELL_LIMIT // (n * (slots or 1)))
+    if capacity >= MIN_CAPACITY_CELLS:
+        # Prices are rounded up to whole cells, so any set the DP picks really fits
+        unit = budget / capacity
+        weights = [math.ceil(price / unit - 1e-9) for price in prices]
+        if slots is None:
+            return _exact(weights, scores, capacity)
+        return _exact_limited(weights, scores, capacity, slots)
+    return _heuristic(prices, scores, budget, slots, time.perf_counter() + time_budget)
+
+def _exact(weights, scores, capacity):
+    best = [0.0] * (capacity + 1)
+    taken = []
+    for weight, score in zip(weights, scores):
+        row = bytearray(capacity + 1)
+        for c in range(capacity, weight - 1, -1):
+            candidate = best[c - weight] + score
+            if candidate > best[c]:
+                best[c] = candidate
+                row[c] = 1
+        taken.append(row)
+
+    chosen = []
+    c = capacity
+    for i in range(len(weights) - 1, -1, -1):
+        if taken[i][c]:
+            chosen.append(i)
+            c -= weights[i]
+    return chosen
+
+def _exact_limited(weights, scores, capacity, slots):
+    # best[k][c]: highest score using at most k items costing at most c cells
+    best = [[0.0] * (capacity + 1) for _ in range(slots + 1)]
+    taken = []
+    for weight, score in zip(weights, scores):
+        rows = [None] + [bytearray(capacity + 1) for _ in range(slots)]
+        for k in range(slots, 0, -1):
+            current, previous, row = best[k], best[k - 1], rows[k]
+            for c in range(capacity, weight - 1, -1):
+                candidate = previous[c - weight] + score
+                if candidate > current[c]:
+                    current[c] = candidate
+                    row[c] = 1
+        taken.append(rows)
+
+    chosen = []
+    k, c = slots, capacity
+    for i in range(len(weights) - 1, -1, -1):
+        if k and taken[i][k][c]:
+            chosen.append(i)
+            k -= 1
+            c -= weights[i]
+    return chosen
+
+def _heuristic(prices, scores, budget, slots, deadline):
+    limit = slots if slots is not None else len(prices)
+    # Partial selection instead of a full sort keeps large catalogs within the time budget
+    ratio = lambda i: scores[i] / prices[i] if prices[i] > 0 else math.inf
+    order = heapq.nlargest(HEURISTIC_CANDIDATES, range(len(prices)), key=ratio)
+    shortlisted = set(order)
+    order.extend(sorted(
+        (i for i in heapq.nlargest(HEURISTIC_CANDIDATES, range(len(prices)), key=scores.__getitem__)
+         if i not in shortlisted),
+        key=ratio, reverse=True,
+    ))
+
+    def fill(chosen, spent):
+        for i in order:
+            if len(chosen) == limit:
+                break
+            if i not in chosen and spent + prices[i] <= budget:
+                chosen.add(i)
+                spent += prices[i]
+        return spent
+
+    chosen = set()
+    spent = fill(chosen, 0.0)
+
+    # The single best item can beat a greedy fill of cheap ones
+    best_single = max(order, key=lambda i: scores[i])
+    if scores[best_single] > sum(scores[i] for i in chosen):
+        chosen = {best_single}
+        spent = fill(chosen, prices[best_single])
+
+    # Swap a chosen item for a better-scoring one that still fits, until no swap helps
+    # or the time budget runs out
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for out in sorted(chosen, key=lambda i: scores[i]):
+            for checked, i in enumerate(order):
+                if checked % 1024 == 0 and time.perf_counter() >= deadline:
+                    return list(chosen)
+                if i in chosen or scores[i] <= scores[out]:
+                    continue
+                if spent - prices[out] + prices[i] <= budget:
+                    chosen.discard(out)
+                    chosen.add(i)
+                    spent = fill(chosen, spent - prices[out] + prices[i])
+                    improved = True
+                    break
+            if improved:
+                break
+    return list(chosen)
@@ -0,0 +1,109 @@
+"""Ingest and query benchmarks for the columnar offer catalog.
+
+Generates a synthetic hotel dump, builds a catalog from it (JSONL and CSV), then
+compares start-up and query latency of the memory-mapped catalog with the
+in-memory OfferStore. Run from the repository root:
+
+    python -m benchmarks.bench_offer_catalog [offers]
+"""
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from inventory_store import OfferStore
+from offer_catalog import HOTEL_COLUMNS, OfferCatalog, build_catalog, read_offer_records
+
+DEFAULT_OFFERS = 1_000_000
+CITIES = 200
+QUERIES = 20_000
+
+def synthetic_hotels(count, seed=7):
+    rng = random.Random(seed)
+    for i in range(count):
+        city = f"City {rng.randrange(CITIES):03d}"
+        yield {
+            "destination": city,
+            "name": f"Hotel {i}",
+            "address": f"{rng.randrange(1, 999)} Main Street, {city}",
+            "price_per_night": round(rng.uniform(40.0, 900.0), 2),
+        }
+
+def write_dumps(directory, count):
+    jsonl_path = os.path.join(directory, "hotels.jsonl")
+    csv_path = os.path.join(directory, "hotels.csv")
+    with open(jsonl_path, "w", encoding="utf-8") as f:
+        for record in synthetic_hotels(count):
+            f.write(json.dumps(record) + "\n")
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["destination", *HOTEL_COLUMNS])
+        writer.writeheader()
+        writer.writerows(synthetic_hotels(count))
+    return jsonl_path, csv_path
+
+def directory_size(directory):
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def query_latencies(store, destinations, query):
+    samples = []
+    for destination in destinations:
+        start = time.perf_counter()
+        query(store, destination)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return percentile(samples, 0.5), percentile(samples, 0.99)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_OFFERS
+    with tempfile.TemporaryDirectory() as workdir:
+        jsonl_path, csv_path = write_dumps(workdir, count)
+
+        print(f"Ingest ({count} hotel offers)")
+        for label, path in (("jsonl", jsonl_path), ("csv", csv_path)):
+            catalog_dir = os.path.join(workdir, f"catalog-{label}")
+            _, seconds = timed(lambda: build_catalog(
+                read_offer_records(path), catalog_dir, HOTEL_COLUMNS, price_field="price_per_night"
+            ))
+            print(f"  {label:<6}{seconds:>8.2f} s {count / seconds:>12,.0f} offers/s"
+                  f" {os.path.getsize(path) / 1e6:>8.1f} MB source"
+                  f" {directory_size(catalog_dir) / 1e6:>8.1f} MB catalog")
+
+        print("Start-up")
+        catalog, catalog_open = timed(lambda: OfferCatalog(os.path.join(workdir, "catalog-jsonl")))
+        by_destination = {}
+        for record in synthetic_hotels(count):
+            by_destination.setdefault(record.pop("destination"), []).append(record)
+        store, store_build = timed(lambda: OfferStore.from_records(
+            by_destination, tuple(HOTEL_COLUMNS), price_field="price_per_night"
+        ))
+        print(f"  {'OfferCatalog open':<22}{catalog_open * 1e3:>10.2f} ms")
+        print(f"  {'OfferStore build':<22}{store_build * 1e3:>10.2f} ms")
+
+        rng = random.Random(11)
+        destinations = [f"City {rng.randrange(CITIES):03d}" for _ in range(QUERIES)]
+        queries = {
+            "cheapest": lambda s, d: s.cheapest(d),
+            "top_k(10)": lambda s, d: s.top_k(d, 10),
+            "offers(max 60)": lambda s, d: list(s.offers(d, max_price=60.0)),
+        }
+        print(f"Queries ({QUERIES} per row, microseconds)")
+        print(f"  {'query':<18}{'catalog p50':>12}{'p99':>10}{'store p50':>12}{'p99':>10}")
+        for name, query in queries.items():
+            catalog_p50, catalog_p99 = query_latencies(catalog, destinations, query)
+            store_p50, store_p99 = query_latencies(store, destinations, query)
+            print(f"  {name:<18}{catalog_p50:>12.1f}{catalog_p99:>10.1f}{store_p50:>12.1f}{store_p99:>10.1f}")
+        catalog.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Compare the JSON message path with the compact payload codec.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_payload_codec
+"""
+import time
+from datetime import datetime
+
+from payload_codec import CompactPayload, decode_model, encode_model, pack, unpack
+from events_agent import EventsResponse, find_events, get_events
+from transportation_agent import TransportationResponse, get_transportation_info
+from destination_advisor_agent import DestinationAdviceRequest, get_destination_advice
+
+ITERATIONS = 2000
+
+
+def sample_messages():
+    start_date = datetime(2024, 6, 25)
+    end_date = datetime(2024, 7, 16)
+    event_list = find_events("Paris, France", start_date, end_date)
+    events = EventsResponse(
+        events=get_events("Paris, France", start_date, end_date, event_list),
+        event_list=event_list,
+    )
+    recommendations, estimated_cost, pass_plan = get_transportation_info("Tokyo", 10, 5)
+    transportation = TransportationResponse(
+        recommendations=recommendations,
+        estimated_cost=estimated_cost,
+        pass_plan=pass_plan,
+    )
+    advice = get_destination_advice(DestinationAdviceRequest(
+        destination="New York",
+        start_date="2024-12-20",
+        end_date="2025-01-03",
+        budget=3500.0,
+        preferences="vegetarian, street food, museums",
+    ))
+    return [
+        ("EventsResponse", events),
+        ("TransportationResponse", transportation),
+        ("DestinationAdviceResponse", advice),
+    ]
+
+
+def time_per_call(func, iterations=ITERATIONS):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    print(f"{'message':<28}{'path':<16}{'bytes':>10}{'encode us':>12}{'decode us':>12}")
+    for name, msg in sample_messages():
+        model_cls = type(msg)
+
+        json_body = msg.json()
+        json_encode = time_per_call(msg.json)
+        json_decode = time_per_call(lambda: model_cls.parse_raw(json_body))
+
+        binary = encode_model(msg)
+        binary_encode = time_per_call(lambda: encode_model(msg))
+        binary_decode = time_per_call(lambda: decode_model(binary, model_cls))
+
+        # What actually goes over the wire: the CompactPayload envelope body
+        wire = pack(msg).json()
+        wire_encode = time_per_call(lambda: pack(msg).json())
+        wire_decode = time_per_call(lambda: unpack(CompactPayload.parse_raw(wire), model_cls))
+
+        assert decode_model(binary, model_cls) == msg
+
+        print(f"{name:<28}{'json':<16}{len(json_body.encode()):>10}{json_encode:>12.1f}{json_decode:>12.1f}")
+        print(f"{'':<28}{'compact binary':<16}{len(binary):>10}{binary_encode:>12.1f}{binary_decode:>12.1f}")
+        print(f"{'':<28}{'compact wire':<16}{len(wire.encode()):>10}{wire_encode:>12.1f}{wire_decode:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Offline ingestion and retrieval benchmarks for RAGEngine.
+
+Builds a synthetic travel corpus in which every document describes one made-up place,
+ingests it with the local hash embeddings (no network), then reports ingestion
+throughput (RAGEngine.load_documents and the streaming rag.ingest pipeline, each into
+an empty store), index size, retrieval latency percentiles and recall@k over queries
+that each name one document's place. Run from the repository root:
+
+    python -m benchmarks.bench_rag --documents 2000 --chunk-size 1000 --chunk-overlap 200
+
+Compare settings by re-running with other --chunk-size / --chunk-overlap / --k values;
+all retrievers (hybrid, vector, bm25) are measured on every run.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import tempfile
+import time
+
+from langchain.llms.fake import FakeListLLM
+from langchain.schema import Document
+from rag.embeddings import CachedEmbeddings, HashEmbeddings
+from rag.engine import RAGEngine
+from rag.ingest import ingest
+from rag.retrieval import KNOWN_DESTINATIONS, TOPIC_KEYWORDS, query_destination
+
+SYLLABLES = ("ka", "lo", "mi", "ra", "ven", "tor", "sel", "qui", "dar", "nu", "bel", "sa", "zen", "ori", "pa")
+FILLER = (
+    "Visitors often arrive early to avoid the crowds.",
+    "Locals recommend checking opening hours before you go.",
+    "The area is easy to reach and well signposted.",
+    "Prices vary with the season, so plan ahead.",
+    "Bring comfortable shoes and a bottle of water.",
+    "Evenings are quieter and the light is softer.",
+)
+
+def place_name(rng):
+    return " ".join(
+        "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize() for _ in range(2)
+    )
+
+def synthetic_corpus(count, seed=5):
+    """Return (documents, labelled queries): each query names the place of one document."""
+    rng = random.Random(seed)
+    documents = []
+    queries = []
+    for i in range(count):
+        destination = rng.choice(KNOWN_DESTINATIONS)
+        topic = rng.choice(list(TOPIC_KEYWORDS))
+        keywords = TOPIC_KEYWORDS[topic]
+        place = place_name(rng)
+        sentences = [f"{place} in {destination.title()} is known for its {rng.choice(keywords)}."]
+        for _ in range(rng.randint(8, 20)):
+            sentences.append(rng.choice(FILLER))
+            if rng.random() < 0.4:
+                sentences.append(f"At {place} the {rng.choice(keywords)} is worth a look.")
+        source = f"doc-{i}"
+        documents.append(Document(page_content=" ".join(sentences), metadata={"source": source}))
+        queries.append((f"What should I know about {place} in {destination.title()}?", source))
+    return documents, queries
+
+def write_jsonl(documents, path):
+    with open(path, "w", encoding="utf-8") as f:
+        for document in documents:
+            f.write(json.dumps({"text": document.page_content, "metadata": document.metadata}) + "\n")
+
+def make_engine(workdir, name, args):
+    """An engine over an empty store, with its own embedding cache so no path reuses another's vectors."""
+    embeddings = CachedEmbeddings(
+        HashEmbeddings(args.dimensions), cache_path=os.path.join(workdir, f"{name}-embeddings.sqlite3")
+    )
+    engine = RAGEngine(
+        persist_directory=os.path.join(workdir, name),
+        embeddings=embeddings,
+        llm=FakeListLLM(responses=["ok"]),
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+    )
+    return engine, embeddings
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda fraction: ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+    return pick(0.5), pick(0.95), pick(0.99)
+
+def sources_of(engine, retriever, query, k):
+    if retriever == "hybrid":
+        engine.retriever.k = k
+        documents = engine.retriever.get_relevant_documents(query)
+    elif retriever == "vector":
+        documents = engine.vector_store.similarity_search(query, k=k)
+    else:
+        ids = [id_ for id_, _ in engine.bm25.search(query, query_destination(query), k)]
+        stored = engine.vector_store.get(ids=ids, include=["metadatas"]) if ids else {"metadatas": []}
+        return [metadata["source"] for metadata in stored["metadatas"]]
+    return [document.metadata["source"] for document in documents]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--dimensions", type=int, default=256)
+    args = parser.parse_args()
+
+    documents, queries = synthetic_corpus(args.documents)
+    queries = random.Random(9).sample(queries, min(args.queries, len(queries)))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        engine, embeddings = make_engine(workdir, "store", args)
+
+        start = time.perf_counter()
+        counts = engine.load_documents(documents)
+        seconds = time.perf_counter() - start
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        chunks = counts["added"]
+        print(f"Corpus: {args.documents} documents, {chunks} chunks "
+              f"(chunk_size={args.chunk_size}, chunk_overlap={args.chunk_overlap})")
+        print("Ingestion into an empty store")
+        print(f"  load_documents: {seconds:.2f} s, {args.documents / seconds:,.0f} documents/s, "
+              f"{chunks / seconds:,.0f} chunks/s")
+
+        corpus_path = os.path.join(workdir, "corpus.jsonl")
+        write_jsonl(documents, corpus_path)
+        streaming, streaming_embeddings = make_engine(workdir, "streaming-store", args)
+        stats = ingest(streaming, corpus_path, chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+        print(f"  rag.ingest:     {stats['seconds']:.2f} s, {stats['documents'] / stats['seconds']:,.0f} documents/s, "
+              f"{stats['added'] / stats['seconds']:,.0f} chunks/s")
+        streaming.close()
+        streaming_embeddings.close()
+
+        print(f"Index size: {directory_size(os.path.join(workdir, 'store')) / 1e6:.1f} MB on disk, "
+              f"{(rss_after - rss_before) / 1e3:.0f} MB peak RSS growth while building (ru_maxrss, KB on Linux)")
+
+        start = time.perf_counter()
+        reload = engine.load_documents(documents)
+        print(f"Reload of an unchanged corpus: {time.perf_counter() - start:.2f} s ({reload['added']} chunks re-embedded)")
+
+        print(f"Retrieval over {len(queries)} labelled queries (milliseconds)")
+        print(f"  {'retriever':<10}{'p50':>8}{'p95':>8}{'p99':>8}{f'recall@{args.k}':>12}")
+        for retriever in ("hybrid", "vector", "bm25"):
+            latencies = []
+            found = 0
+            for query, source in queries:
+                start = time.perf_counter()
+                sources = sources_of(engine, retriever, query, args.k)
+                latencies.append((time.perf_counter() - start) * 1e3)
+                found += source in sources
+            p50, p95, p99 = percentiles(latencies)
+            print(f"  {retriever:<10}{p50:>8.2f}{p95:>8.2f}{p99:>8.2f}{found / len(queries):>12.3f}")
+        engine.close()
+        embeddings.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 from uagents import Agent, Context, Model
+from payload_codec import enable_compact_payloads, reply
 
 class BudgetRequest(Model):
     destination: str
@@ -42,7 +43,10 @@ async def handle_budget_request(ctx: Context, sender: str, msg: BudgetRequest):
         breakdown=breakdown["text"]
     )
     
-    await ctx.send(sender, response)
+    await reply(ctx, sender, response)
+
+# Accept BudgetRequest as a compact payload from peers that negotiate it
+enable_compact_payloads(budget_agent, {BudgetRequest: handle_budget_request})
 
 def calculate_budget(destination, total_budget, duration_days):
     """Calculate budget breakdown based on destination, total budget, and duration."""
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+from uagents import Agent, Context, Model
+from payload_codec import enable_compact_payloads, reply
+from datetime import datetime
+from weather_agent import WeatherResponse, get_simulated_weather
+from budget_agent import BudgetResponse, calculate_budget
+from photo_spots_agent import PhotoSpotsResponse, get_photo_spots
+from dietary_agent import DietaryResponse, process_preferences, get_food_recommendations
+from transportation_agent import TransportationResponse, get_transportation_info
+from events_agent import EventsResponse, find_events, get_events
+
+class DestinationAdviceRequest(Model):
+    destination: str
+    start_date: str
+    end_date: str
+    budget: float
+    preferences: str
+    rides_per_day: int = 4
+
+class DestinationAdviceResponse(Model):
+    weather: WeatherResponse
+    budget: BudgetResponse
+    photo_spots: PhotoSpotsResponse
+    dietary: DietaryResponse
+    transportation: TransportationResponse
+    events: EventsResponse
+
+# Create the destination advisor agent: one message in, one message out, covering all
+# six specialists so the planner skips six request/response round trips per plan
+destination_advisor_agent = Agent(
+    name="destination_advisor",
+    port=8015,
+    endpoint=["http://localhost:8015/submit"],
+)
+
+@destination_advisor_agent.on_event("startup")
+async def startup(ctx: Context):
+    ctx.logger.info(f"Destination Advisor Agent started with address: {destination_advisor_agent.address}")
+
+@destination_advisor_agent.on_message(model=DestinationAdviceRequest)
+async def handle_destination_advice_request(ctx: Context, sender: str, msg: DestinationAdviceRequest):
+    ctx.logger.info(f"Received destination advice request for {msg.destination} from {msg.start_date} to {msg.end_date}")
+
+    # Run every specialist locally and send back one composite response
+    response = get_destination_advice(msg)
+    await reply(ctx, sender, response)
+
+# Accept DestinationAdviceRequest as a compact payload from peers that negotiate it
+enable_compact_payloads(destination_advisor_agent, {DestinationAdviceRequest: handle_destination_advice_request})
+
+def get_destination_advice(msg):
+    """Run the weather, budget, photo, dietary, transport and events logic for one request."""
+    start_date = datetime.strptime(msg.start_date, "%Y-%m-%d")
+    end_date = datetime.strptime(msg.end_date, "%Y-%m-%d")
+    duration_days = (end_date - start_date).days + 1
+
+    weather_data = get_simulated_weather(msg.destination, msg.start_date, msg.end_date)
+    weather = WeatherResponse(
+        destination=msg.destination,
+        forecast=weather_data["forecast"],
+        avg_temp=weather_data["avg_temp"],
+        clothing_suggestions=weather_data["clothing_suggestions"]
+    )
+
+    breakdown = calculate_budget(msg.destination, msg.budget, duration_days)
+    budget = BudgetResponse(
+        accommodation_budget=breakdown["accommodation"],
+        food_budget=breakdown["food"],
+        transportation_budget=breakdown["transportation"],
+        activities_budget=breakdown["activities"],
+        shopping_budget=breakdown["shopping"],
+        breakdown=breakdown["text"]
+    )
+
+    photo_spots = PhotoSpotsResponse(spots=get_photo_spots(msg.destination))
+
+    dietary = DietaryResponse(
+        recommendations=get_food_recommendations(msg.destination, process_preferences(msg.preferences))
+    )
+
+    recommendations, estimated_cost, pass_plan = get_transportation_info(
+        msg.destination, duration_days, msg.rides_per_day
+    )
+    transportation = TransportationResponse(
+        recommendations=recommendations,
+        estimated_cost=estimated_cost,
+        pass_plan=pass_plan
+    )
+
+    event_list = find_events(msg.destination, start_date, end_date)
+    events = EventsResponse(
+        events=get_events(msg.destination, start_date, end_date, event_list),
+        event_list=event_list
+    )
+
+    return DestinationAdviceResponse(
+        weather=weather,
+        budget=budget,
+        photo_spots=photo_spots,
+        dietary=dietary,
+        transportation=transportation,
+        events=events
+    )
+
+if __name__ == "__main__":
+    destination_advisor_agent.run()
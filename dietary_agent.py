@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
+import re
 from uagents import Agent, Context, Model
+from payload_codec import enable_compact_payloads, reply
 
 class DietaryRequest(Model):
     destination: str
@@ -8,6 +10,79 @@ class DietaryRequest(Model):
 class DietaryResponse(Model):
     recommendations: str
 
+# Dietary preference flags, packed into a single int bitmask
+VEGETARIAN = 1 << 0
+VEGAN = 1 << 1
+GLUTEN_FREE = 1 << 2
+DAIRY_FREE = 1 << 3
+HALAL = 1 << 4
+KOSHER = 1 << 5
+ALLERGIES = 1 << 6
+SPICY = 1 << 7
+LOCAL = 1 << 8
+BUDGET = 1 << 9
+FINE_DINING = 1 << 10
+STREET_FOOD = 1 << 11
+
+# Phrases (and their synonyms) recognised in the preferences string
+PREFERENCE_SYNONYMS = {
+    "vegetarian": VEGETARIAN,
+    "veggie": VEGETARIAN,
+    "meatless": VEGETARIAN,
+    "no meat": VEGETARIAN,
+    "vegan": VEGAN,
+    "plant-based": VEGAN,
+    "plant based": VEGAN,
+    "gluten free": GLUTEN_FREE,
+    "gluten-free": GLUTEN_FREE,
+    "no gluten": GLUTEN_FREE,
+    "celiac": GLUTEN_FREE,
+    "coeliac": GLUTEN_FREE,
+    "dairy free": DAIRY_FREE,
+    "dairy-free": DAIRY_FREE,
+    "no dairy": DAIRY_FREE,
+    "lactose": DAIRY_FREE,
+    "halal": HALAL,
+    "kosher": KOSHER,
+    "allergy": ALLERGIES,
+    "allergies": ALLERGIES,
+    "allergic": ALLERGIES,
+    "nuts": ALLERGIES,
+    "peanut": ALLERGIES,
+    "seafood": ALLERGIES,
+    "shellfish": ALLERGIES,
+    "spicy": SPICY,
+    "local": LOCAL,
+    "authentic": LOCAL,
+    "traditional": LOCAL,
+    "cheap": BUDGET,
+    "budget": BUDGET,
+    "inexpensive": BUDGET,
+    "affordable": BUDGET,
+    "fine dining": FINE_DINING,
+    "upscale": FINE_DINING,
+    "fancy": FINE_DINING,
+    "gourmet": FINE_DINING,
+    "street food": STREET_FOOD,
+    "street vendor": STREET_FOOD,
+    "hawker": STREET_FOOD,
+}
+
+# One alternation over every phrase, longest first so "gluten-free" wins over shorter overlaps
+_PREFERENCE_PATTERN = re.compile(
+    r"(?<![a-z])(" + "|".join(re.escape(phrase) for phrase in sorted(PREFERENCE_SYNONYMS, key=len, reverse=True)) + ")"
+)
+
+# Labels for the "DIETARY NOTES" line, in display order
+RESTRICTION_LABELS = [
+    (VEGETARIAN, "Vegetarian options"),
+    (VEGAN, "Vegan options"),
+    (GLUTEN_FREE, "Gluten-free options"),
+    (DAIRY_FREE, "Dairy-free options"),
+    (HALAL, "Halal options"),
+    (KOSHER, "Kosher options"),
+]
+
 # Create the dietary agent
 dietary_agent = Agent(
     name="dietary_planner",
@@ -31,58 +106,22 @@ async def handle_dietary_request(ctx: Context, sender: str, msg: DietaryRequest)
     
     # Create and send the response
     response = DietaryResponse(recommendations=recommendations)
-    await ctx.send(sender, response)
+    await reply(ctx, sender, response)
+
+# Accept DietaryRequest as a compact payload from peers that negotiate it
+enable_compact_payloads(dietary_agent, {DietaryRequest: handle_dietary_request})
 
 def process_preferences(preferences):
-    """Process the dietary preferences string to identify key preferences."""
-    preferences = preferences.lower()
-    
-    dietary_prefs = {
-        "vegetarian": "vegetarian" in preferences,
-        "vegan": "vegan" in preferences,
-        "gluten_free": "gluten free" in preferences or "gluten-free" in preferences,
-        "dairy_free": "dairy free" in preferences or "dairy-free" in preferences or "lactose" in preferences,
-        "halal": "halal" in preferences,
-        "kosher": "kosher" in preferences,
-        "allergies": any(allergy in preferences for allergy in ["allergy", "allergic", "nuts", "seafood", "shellfish"]),
-        "spicy": "spicy" in preferences,
-        "local": "local" in preferences or "authentic" in preferences or "traditional" in preferences,
-        "budget": "cheap" in preferences or "budget" in preferences or "inexpensive" in preferences,
-        "fine_dining": "fine dining" in preferences or "upscale" in preferences or "fancy" in preferences,
-        "street_food": "street food" in preferences or "street vendor" in preferences
-    }
-    
-    return dietary_prefs
+    """Parse the dietary preferences string into a bitmask of preference flags in a single pass."""
+    mask = 0
+    for match in _PREFERENCE_PATTERN.finditer(preferences.lower()):
+        mask |= PREFERENCE_SYNONYMS[match.group(1)]
+    return mask
 
-def get_food_recommendations(destination, preferences):
-    """Get food recommendations based on destination and preferences."""
-    destination = destination.lower()
-    
-    # Start with general recommendations
-    recommendations = f"FOOD RECOMMENDATIONS FOR {destination.upper()}:\n\n"
-    
-    # Add dietary restriction notice if applicable
-    restriction_notes = []
-    if preferences["vegetarian"]:
-        restriction_notes.append("Vegetarian options")
-    if preferences["vegan"]:
-        restriction_notes.append("Vegan options")
-    if preferences["gluten_free"]:
-        restriction_notes.append("Gluten-free options")
-    if preferences["dairy_free"]:
-        restriction_notes.append("Dairy-free options")
-    if preferences["halal"]:
-        restriction_notes.append("Halal options")
-    if preferences["kosher"]:
-        restriction_notes.append("Kosher options")
-    
-    if restriction_notes:
-        recommendations += "DIETARY NOTES: We've focused on " + ", ".join(restriction_notes) + ".\n\n"
-    
-    # Add destination-specific recommendations
-    if "paris" in destination:
-        if preferences["vegetarian"] or preferences["vegan"]:
-            recommendations += """
+# Destination food guides: a plant-based or classic section, then extras keyed by preference flag
+CITY_FOOD_GUIDES = {
+    "paris": {
+        "plant_based": """
 VEGETARIAN/VEGAN IN PARIS:
 - Wild & The Moon - Trendy vegan cafe with multiple locations
 - Le Potager du Marais - Traditional French cuisine veganized
@@ -93,9 +132,8 @@ MUST-TRY DISHES:
 - Ratatouille (vegetable stew)
 - Socca (chickpea flatbread)
 - Falafel from L'As du Fallafel in Le Marais
-"""
-        else:
-            recommendations += """
+""",
+        "classic": """
 CLASSIC PARISIAN FOOD:
 - Croissants and pain au chocolat from local bakeries
 - Steak frites at bistros like Le Relais de l'Entrecôte
@@ -108,29 +146,26 @@ TOP FOOD EXPERIENCES:
 - Picnic with cheese from Fromagerie Laurent Dubois
 - Macarons from Pierre Hermé or Ladurée
 - Wine and cheese tasting at La Vache dans les Vignes
-"""
-        
-        if preferences["budget"]:
-            recommendations += """
+""",
+        "extras": [
+            (BUDGET, """
 BUDGET-FRIENDLY OPTIONS:
 - Crepe stands throughout the city
 - Bakeries for affordable sandwiches (try jambon-beurre)
 - Le Bouillon Chartier for classic French food at reasonable prices
 - Rue Mouffetard market street for affordable eats
-"""
-        
-        if preferences["fine_dining"]:
-            recommendations += """
+"""),
+            (FINE_DINING, """
 FINE DINING EXPERIENCES:
 - Le Jules Verne - Eiffel Tower restaurant with spectacular views
 - L'Ambroisie - Classic 3-Michelin-star French cuisine
 - Septime - Modern French cuisine (reserve well in advance)
 - Alain Ducasse au Plaza Athénée - Haute cuisine experience
-"""
-    
-    elif "tokyo" in destination:
-        if preferences["vegetarian"] or preferences["vegan"]:
-            recommendations += """
+"""),
+        ],
+    },
+    "tokyo": {
+        "plant_based": """
 VEGETARIAN/VEGAN IN TOKYO:
 - Ain Soph Journey - Popular vegan restaurant chain
 - T's TanTan - Vegan ramen in Tokyo Station
@@ -142,9 +177,8 @@ MUST-TRY DISHES:
 - Zaru soba (cold buckwheat noodles)
 - Vegetarian sushi rolls
 - Shojin ryori (Buddhist temple cuisine)
-"""
-        else:
-            recommendations += """
+""",
+        "classic": """
 CLASSIC TOKYO FOOD:
 - Sushi at Tsukiji Outer Market
 - Ramen at shops in Tokyo Station Ramen Street
@@ -157,29 +191,26 @@ TOP FOOD EXPERIENCES:
 - Izakaya hopping in Shinjuku
 - Department store food halls (depachika)
 - Themed cafes in Harajuku
-"""
-        
-        if preferences["budget"]:
-            recommendations += """
+""",
+        "extras": [
+            (BUDGET, """
 BUDGET-FRIENDLY OPTIONS:
 - Conveyor belt sushi (kaitenzushi)
 - Yoshinoya and other gyudon (beef bowl) chains
 - Convenience store (konbini) meals - better than you'd expect!
 - Standing soba shops
-"""
-        
-        if preferences["street_food"]:
-            recommendations += """
+"""),
+            (STREET_FOOD, """
 STREET FOOD & MARKETS:
 - Takoyaki (octopus balls) in Asakusa
 - Okonomiyaki in Harajuku
 - Ameya-Yokocho Market in Ueno
 - Nakamise Shopping Street in Asakusa
-"""
-    
-    elif "bali" in destination:
-        if preferences["vegetarian"] or preferences["vegan"]:
-            recommendations += """
+"""),
+        ],
+    },
+    "bali": {
+        "plant_based": """
 VEGETARIAN/VEGAN IN BALI:
 - Zest in Ubud - Innovative vegan cuisine
 - Peloton Supershop - Vegan cafe in Canggu
@@ -191,9 +222,8 @@ MUST-TRY DISHES:
 - Tempeh satay
 - Sayur urap (vegetable salad with coconut)
 - Jamu (traditional herbal drink)
-"""
-        else:
-            recommendations += """
+""",
+        "classic": """
 CLASSIC BALINESE FOOD:
 - Babi guling (suckling pig) at Ibu Oka in Ubud
 - Nasi campur (mixed rice plate)
@@ -206,29 +236,28 @@ TOP FOOD EXPERIENCES:
 - Traditional Balinese cooking class
 - Sunday brunch at Ku De Ta in Seminyak
 - Sunset drinks at Single Fin in Uluwatu
-"""
-        
-        if preferences["budget"]:
-            recommendations += """
+""",
+        "extras": [
+            (BUDGET, """
 BUDGET-FRIENDLY OPTIONS:
 - Local warungs (small family-owned restaurants)
 - Nasi campur stands (look for busy ones with locals)
 - Pasar malam (night markets)
 - Nasi jinggo (small rice packets with sides)
-"""
-        
-        if preferences["fine_dining"]:
-            recommendations += """
+"""),
+            (FINE_DINING, """
 FINE DINING EXPERIENCES:
 - Locavore in Ubud - Inventive cuisine using local ingredients
 - Mejekawi by Ku De Ta - Tasting kitchen concept
 - Apéritif - Colonial-inspired fine dining in Ubud
 - Room4Dessert - Unique dessert-focused tasting menu
-"""
-    
-    else:
-        # Generic recommendations for other destinations
-        recommendations += """
+"""),
+        ],
+    },
+}
+
+# Generic recommendations for other destinations
+GENERAL_FOOD_GUIDE = """
 GENERAL FOOD RECOMMENDATIONS:
 
 - Seek out local specialties unique to the region
@@ -242,9 +271,8 @@ LOCAL FOOD APPS:
 - Google Maps for nearby suggestions with reviews
 - Consider local food apps if available for your destination
 """
-    
-    if preferences["allergies"]:
-        recommendations += """
+
+ALLERGY_NOTES = """
 
 ALLERGY INFORMATION:
 - Carry an allergy translation card in the local language
@@ -252,8 +280,50 @@ ALLERGY INFORMATION:
 - Learn how to ask about allergens in the local language
 - Consider dining at more tourist-friendly restaurants where staff may speak English
 """
+
+# Rendered recommendation bodies keyed by (city, preference bitmask). Both parts of the key
+# come from small fixed sets, so the cache is naturally bounded.
+_RECOMMENDATION_CACHE = {}
+
+def _render_recommendations(city, preferences):
+    """Render the recommendation body for a known city (or None) and a preference bitmask."""
+    recommendations = ""
+    
+    # Add dietary restriction notice if applicable
+    restriction_notes = [label for flag, label in RESTRICTION_LABELS if preferences & flag]
+    if restriction_notes:
+        recommendations += "DIETARY NOTES: We've focused on " + ", ".join(restriction_notes) + ".\n\n"
+    
+    # Add destination-specific recommendations
+    guide = CITY_FOOD_GUIDES.get(city)
+    if guide:
+        if preferences & (VEGETARIAN | VEGAN):
+            recommendations += guide["plant_based"]
+        else:
+            recommendations += guide["classic"]
+        for flag, section in guide["extras"]:
+            if preferences & flag:
+                recommendations += section
+    else:
+        recommendations += GENERAL_FOOD_GUIDE
+    
+    if preferences & ALLERGIES:
+        recommendations += ALLERGY_NOTES
     
     return recommendations
 
+def get_food_recommendations(destination, preferences):
+    """Get food recommendations based on destination and a preference bitmask."""
+    destination = destination.lower()
+    city = next((name for name in CITY_FOOD_GUIDES if name in destination), None)
+    
+    key = (city, preferences)
+    body = _RECOMMENDATION_CACHE.get(key)
+    if body is None:
+        body = _render_recommendations(city, preferences)
+        _RECOMMENDATION_CACHE[key] = body
+    
+    return f"FOOD RECOMMENDATIONS FOR {destination.upper()}:\n\n" + body
+
 if __name__ == "__main__":
-    dietary_agent.run() 
\ No newline at end of file
+    dietary_agent.run()
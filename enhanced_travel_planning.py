@@ -8,6 +8,20 @@ from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from fetch_ai_agent import FetchAIAgent
+from payload_codec import send_and_receive_compact
+from destination_advisor_agent import (
+    destination_advisor_agent,
+    DestinationAdviceRequest,
+    DestinationAdviceResponse,
+)
+
+# How the travel agent gathers specialist advice: "fanout" sends one request per
+# specialist agent, "composite" sends a single request to the destination advisor
+TRAVEL_PLANNING_MODE = os.getenv("TRAVEL_PLANNING_MODE", "fanout")
+
+# Opt in to the compact binary payload codec for specialist requests; the codec is
+# negotiated with each specialist and falls back to JSON for peers that lack it
+COMPACT_PAYLOADS = os.getenv("COMPACT_PAYLOADS", "").lower() in ("1", "true", "yes")
 
 # Initialize Fetch AI Agent
 fetch_ai = FetchAIAgent()
@@ -67,10 +81,12 @@ class DietaryResponse(Model):
 class TransportationRequest(Model):
     destination: str
     duration_days: int
+    rides_per_day: int = 4  # Expected public transport rides per day
 
 class TransportationResponse(Model):
     recommendations: str
     estimated_cost: float
+    pass_plan: list = []  # Cheapest combination of fares and passes covering the stay
 
 class EventsRequest(Model):
     destination: str
@@ -79,6 +95,7 @@ class EventsRequest(Model):
 
 class EventsResponse(Model):
     events: str
+    event_list: list = []  # Structured events overlapping the stay, sorted by date
 
 # ----- Agent Definitions -----
 
@@ -166,65 +183,12 @@ async def handle_travel_request(ctx: Context, sender: str, msg: TravelRequest):
         # Calculate trip duration in days
         duration_days = (end_date - start_date).days + 1
         
-        # Request weather information
-        ctx.logger.info("Requesting weather information...")
-        weather_req = WeatherRequest(
-            destination=msg.destination,
-            start_date=msg.start_date,
-            end_date=msg.end_date
-        )
-        weather_resp, weather_status = await ctx.send_and_receive(
-            weather_agent.address, weather_req, response_type=WeatherResponse
-        )
-        
-        # Request budget breakdown
-        ctx.logger.info("Requesting budget breakdown...")
-        budget_req = BudgetRequest(
-            destination=msg.destination,
-            total_budget=msg.budget,
-            duration_days=duration_days
-        )
-        budget_resp, budget_status = await ctx.send_and_receive(
-            budget_agent.address, budget_req, response_type=BudgetResponse
-        )
-        
-        # Request photo spots
-        ctx.logger.info("Requesting photo spots...")
-        photo_req = PhotoSpotsRequest(destination=msg.destination)
-        photo_resp, photo_status = await ctx.send_and_receive(
-            photo_spots_agent.address, photo_req, response_type=PhotoSpotsResponse
-        )
-        
-        # Request dietary recommendations
-        ctx.logger.info("Requesting dietary recommendations...")
-        diet_req = DietaryRequest(
-            destination=msg.destination,
-            preferences=msg.preferences
-        )
-        diet_resp, diet_status = await ctx.send_and_receive(
-            dietary_agent.address, diet_req, response_type=DietaryResponse
-        )
-        
-        # Request transportation options
-        ctx.logger.info("Requesting transportation options...")
-        transport_req = TransportationRequest(
-            destination=msg.destination,
-            duration_days=duration_days
-        )
-        transport_resp, transport_status = await ctx.send_and_receive(
-            transportation_agent.address, transport_req, response_type=TransportationResponse
-        )
-        
-        # Request local events
-        ctx.logger.info("Requesting local events...")
-        events_req = EventsRequest(
-            destination=msg.destination,
-            start_date=msg.start_date,
-            end_date=msg.end_date
-        )
-        events_resp, events_status = await ctx.send_and_receive(
-            events_agent.address, events_req, response_type=EventsResponse
-        )
+        # Gather specialist advice, either one agent at a time or in one composite message
+        if TRAVEL_PLANNING_MODE == "composite":
+            specialist_responses = await request_composite_advice(ctx, msg)
+        else:
+            specialist_responses = await request_fanout_advice(ctx, msg, duration_days)
+        weather_resp, budget_resp, photo_resp, diet_resp, transport_resp, events_resp = specialist_responses
         
         # Compile the comprehensive travel plan
         itinerary = f"""
@@ -295,6 +259,104 @@ NOTES:
     except Exception as e:
         await ctx.send(sender, {"error": str(e)})
 
+async def send_specialist_request(ctx: Context, destination: str, request: Model, response_type):
+    """Send a request to a specialist agent, over the compact codec when enabled."""
+    if COMPACT_PAYLOADS:
+        return await send_and_receive_compact(ctx, destination, request, response_type)
+    return await ctx.send_and_receive(destination, request, response_type=response_type)
+
+async def request_fanout_advice(ctx: Context, msg: TravelRequest, duration_days: int):
+    """Ask each specialist agent in turn; one request/response pair per specialist."""
+    # Request weather information
+    ctx.logger.info("Requesting weather information...")
+    weather_req = WeatherRequest(
+        destination=msg.destination,
+        start_date=msg.start_date,
+        end_date=msg.end_date
+    )
+    weather_resp, weather_status = await send_specialist_request(
+        ctx, weather_agent.address, weather_req, WeatherResponse
+    )
+    
+    # Request budget breakdown
+    ctx.logger.info("Requesting budget breakdown...")
+    budget_req = BudgetRequest(
+        destination=msg.destination,
+        total_budget=msg.budget,
+        duration_days=duration_days
+    )
+    budget_resp, budget_status = await send_specialist_request(
+        ctx, budget_agent.address, budget_req, BudgetResponse
+    )
+    
+    # Request photo spots
+    ctx.logger.info("Requesting photo spots...")
+    photo_req = PhotoSpotsRequest(destination=msg.destination)
+    photo_resp, photo_status = await send_specialist_request(
+        ctx, photo_spots_agent.address, photo_req, PhotoSpotsResponse
+    )
+    
+    # Request dietary recommendations
+    ctx.logger.info("Requesting dietary recommendations...")
+    diet_req = DietaryRequest(
+        destination=msg.destination,
+        preferences=msg.preferences
+    )
+    diet_resp, diet_status = await send_specialist_request(
+        ctx, dietary_agent.address, diet_req, DietaryResponse
+    )
+    
+    # Request transportation options
+    ctx.logger.info("Requesting transportation options...")
+    transport_req = TransportationRequest(
+        destination=msg.destination,
+        duration_days=duration_days
+    )
+    transport_resp, transport_status = await send_specialist_request(
+        ctx, transportation_agent.address, transport_req, TransportationResponse
+    )
+    
+    # Request local events
+    ctx.logger.info("Requesting local events...")
+    events_req = EventsRequest(
+        destination=msg.destination,
+        start_date=msg.start_date,
+        end_date=msg.end_date
+    )
+    events_resp, events_status = await send_specialist_request(
+        ctx, events_agent.address, events_req, EventsResponse
+    )
+    
+    return weather_resp, budget_resp, photo_resp, diet_resp, transport_resp, events_resp
+
+async def request_composite_advice(ctx: Context, msg: TravelRequest):
+    """Ask the destination advisor for all six specialist answers in one message."""
+    ctx.logger.info("Requesting composite destination advice...")
+    advice_req = DestinationAdviceRequest(
+        destination=msg.destination,
+        start_date=msg.start_date,
+        end_date=msg.end_date,
+        budget=msg.budget,
+        preferences=msg.preferences
+    )
+    advice_resp, advice_status = await send_specialist_request(
+        ctx, destination_advisor_agent.address, advice_req, DestinationAdviceResponse
+    )
+    
+    if not isinstance(advice_resp, DestinationAdviceResponse):
+        ctx.logger.error(f"Failed to get destination advice: {advice_status}")
+        return None, None, None, None, None, None
+    
+    # Re-wrap the nested answers in this module's message models
+    return (
+        WeatherResponse.parse_obj(advice_resp.weather.dict()),
+        BudgetResponse.parse_obj(advice_resp.budget.dict()),
+        PhotoSpotsResponse.parse_obj(advice_resp.photo_spots.dict()),
+        DietaryResponse.parse_obj(advice_resp.dietary.dict()),
+        TransportationResponse.parse_obj(advice_resp.transportation.dict()),
+        EventsResponse.parse_obj(advice_resp.events.dict()),
+    )
+
 # ----- Travel Agent REST API -----
 
 # Create the FastAPI app
@@ -365,6 +427,7 @@ if __name__ == "__main__":
     bureau.add(dietary_agent)
     bureau.add(transportation_agent)
     bureau.add(events_agent)
+    bureau.add(destination_advisor_agent)
     
     # Run all agents
     bureau.run() 
\ No newline at end of file
@@ -0,0 +1,139 @@
+from datetime import date
+
+
+class IntervalIndex:
+    """Augmented interval tree over closed integer intervals.
+
+    Intervals are kept in an array sorted by start; the tree is implicit (the node for
+    a slice [lo, hi) sits at its midpoint) and each node stores the largest end in its
+    subtree, so overlap queries only descend into subtrees that can contain a hit.
+    Inserts are buffered and merged in one sort on the next query, which keeps bulk
+    loads of tens of thousands of intervals cheap.
+    """
+
+    def __init__(self):
+        self._starts = []
+        self._ends = []
+        self._items = []
+        self._max_end = []
+        self._pending = []
+
+    def __len__(self):
+        return len(self._starts) + len(self._pending)
+
+    def add(self, start, end, item):
+        if end < start:
+            raise ValueError(f"Interval end {end} is before start {start}")
+        self._pending.append((start, end, item))
+
+    def overlapping(self, start, end):
+        """Return items whose interval overlaps [start, end], ordered by interval start."""
+        if self._pending:
+            self._rebuild()
+        found = []
+        self._collect(0, len(self._starts), start, end, found)
+        return found
+
+    def _rebuild(self):
+        rows = sorted(
+            list(zip(self._starts, self._ends, self._items)) + self._pending,
+            key=lambda row: (row[0], row[1]),
+        )
+        self._pending = []
+        self._starts = [row[0] for row in rows]
+        self._ends = [row[1] for row in rows]
+        self._items = [row[2] for row in rows]
+        self._max_end = [0] * len(rows)
+        self._build_max_end(0, len(rows))
+
+    def _build_max_end(self, lo, hi):
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        max_end = self._ends[mid]
+        for child in (self._build_max_end(lo, mid), self._build_max_end(mid + 1, hi)):
+            if child is not None and child > max_end:
+                max_end = child
+        self._max_end[mid] = max_end
+        return max_end
+
+    def _collect(self, lo, hi, start, end, found):
+        if lo >= hi:
+            return
+        mid = (lo + hi) // 2
+        if self._max_end[mid] < start:
+            return
+        self._collect(lo, mid, start, end, found)
+        if self._starts[mid] > end:
+            return
+        if self._ends[mid] >= start:
+            found.append(self._items[mid])
+        self._collect(mid + 1, hi, start, end, found)
+
+
+class EventCalendar:
+    """Dated events per city, answering "events overlapping [start, end]" queries."""
+
+    def __init__(self):
+        self._indexes = {}
+        self._annual = {}
+        self._loaded_years = {}
+
+    def add_event(self, city, name, start, end=None, category="event"):
+        """Add a one-off event; start and end are datetime.date values (end defaults to start)."""
+        end = end or start
+        event = {
+            "city": city,
+            "name": name,
+            "category": category,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+        }
+        self._indexes.setdefault(city, IntervalIndex()).add(start.toordinal(), end.toordinal(), event)
+
+    def add_annual_event(self, city, name, start_month_day, end_month_day=None, category="festival"):
+        """Register an event recurring every year; dates are (month, day) tuples.
+
+        An end before the start wraps into the following year. Occurrences are only
+        materialised for the years a query actually touches.
+        """
+        rule = (name, start_month_day, end_month_day or start_month_day, category)
+        self._annual.setdefault(city, []).append(rule)
+        for year in self._loaded_years.get(city, ()):
+            self._add_occurrence(city, year, rule)
+
+    def events_between(self, city, start, end):
+        """Return the events in a city overlapping [start, end], sorted by date."""
+        # Occurrences starting the previous year can wrap into this one
+        self._load_annual(city, range(start.year - 1, end.year + 1))
+        index = self._indexes.get(city)
+        if index is None:
+            return []
+        return index.overlapping(start.toordinal(), end.toordinal())
+
+    def _load_annual(self, city, years):
+        loaded = self._loaded_years.setdefault(city, set())
+        for year in years:
+            if year in loaded:
+                continue
+            loaded.add(year)
+            for rule in self._annual.get(city, []):
+                self._add_occurrence(city, year, rule)
+
+    def _add_occurrence(self, city, year, rule):
+        name, (start_month, start_day), (end_month, end_day), category = rule
+        start = date(year, start_month, start_day)
+        end = date(year, end_month, end_day)
+        if end < start:
+            end = date(year + 1, end_month, end_day)
+        self.add_event(city, name, start, end, category)
+
+
+def month_span(start, end):
+    """Return the month names covered by [start, end], in calendar order."""
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append(date(year, month, 1).strftime("%B"))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 from uagents import Agent, Context, Model
-from datetime import datetime, timedelta
+from payload_codec import enable_compact_payloads, reply
+from datetime import datetime
+from event_calendar import EventCalendar, month_span
 
 class EventsRequest(Model):
     destination: str
@@ -9,6 +11,212 @@ class EventsRequest(Model):
 
 class EventsResponse(Model):
     events: str
+    event_list: list = []  # Structured events overlapping the stay, sorted by date
+
+# Annual events per city as (name, (start month, start day), (end month, end day)).
+# Dates are typical windows; moving events are approximated by the week they usually fall in.
+ANNUAL_EVENTS = {
+    "paris": [
+        ("Spring flower displays at Jardin des Tuileries and Luxembourg Gardens", (4, 1), (5, 31)),
+        ("French Open Tennis Tournament", (5, 20), (6, 9)),
+        ("Paris Jazz Festival", (6, 1), (6, 30)),
+        ("Fête de la Musique - Free music throughout the city", (6, 21), (6, 21)),
+        ("Paris Plages - Seine riverside beaches", (7, 8), (8, 31)),
+        ("Bastille Day Celebrations", (7, 14), (7, 14)),
+        ("Open-air cinema at Parc de la Villette", (7, 15), (8, 25)),
+        ("Outdoor concerts in Parc Floral", (6, 1), (9, 15)),
+        ("Rock en Seine music festival", (8, 22), (8, 25)),
+        ("European Heritage Days - Access to normally closed buildings", (9, 15), (9, 21)),
+        ("Fashion Week", (9, 23), (10, 1)),
+    ],
+    "tokyo": [
+        ("Sumo tournament (January basho)", (1, 8), (1, 22)),
+        ("Cherry Blossom (Sakura) Season", (3, 20), (4, 10)),
+        ("Hanami parties in major parks", (3, 20), (4, 10)),
+        ("Kanamara Matsuri Festival in Kawasaki", (4, 1), (4, 7)),
+        ("Golden Week holidays", (4, 29), (5, 5)),
+        ("Sumo tournament (May basho)", (5, 8), (5, 22)),
+        ("Sanja Matsuri in Asakusa", (5, 15), (5, 21)),
+        ("Rainy season with hydrangea blooms", (6, 1), (6, 30)),
+        ("Tanabata Festival", (7, 7), (7, 7)),
+        ("Summer festivals (matsuri) throughout the city", (7, 1), (8, 31)),
+        ("Fuji Rock Festival", (7, 24), (7, 28)),
+        ("Sumidagawa Fireworks Festival", (7, 27), (7, 27)),
+        ("Obon Festival", (8, 13), (8, 16)),
+        ("Summer Sonic music festival", (8, 16), (8, 18)),
+        ("Tokyo Jazz Festival", (8, 28), (9, 3)),
+        ("Sumo tournament (September basho)", (9, 8), (9, 22)),
+    ],
+    "new york": [
+        ("Tribeca Film Festival", (4, 10), (4, 21)),
+        ("Cherry Blossom Festival at Brooklyn Botanic Garden", (4, 26), (4, 28)),
+        ("Frieze Art Fair", (5, 1), (5, 5)),
+        ("Pride March and Festival", (6, 1), (6, 30)),
+        ("Museum Mile Festival", (6, 11), (6, 11)),
+        ("Shakespeare in the Park", (6, 1), (8, 31)),
+        ("Summer concerts in Central Park", (6, 1), (8, 31)),
+        ("Outdoor movies in Bryant Park", (6, 10), (8, 26)),
+        ("Macy's 4th of July Fireworks", (7, 4), (7, 4)),
+        ("Restaurant Week", (7, 22), (8, 18)),
+        ("US Open Tennis", (8, 26), (9, 8)),
+        ("Fashion Week", (9, 6), (9, 11)),
+        ("San Gennaro Festival in Little Italy", (9, 12), (9, 22)),
+        ("New York Film Festival", (9, 27), (10, 13)),
+        ("Village Halloween Parade", (10, 31), (10, 31)),
+        ("Holiday markets at Bryant Park, Union Square, and Columbus Circle", (10, 25), (1, 5)),
+        ("Macy's Thanksgiving Day Parade (Thanksgiving Day)", (11, 22), (11, 28)),
+        ("Rockefeller Center Christmas Tree Lighting", (12, 1), (12, 7)),
+        ("Radio City Christmas Spectacular", (11, 15), (1, 2)),
+        ("New Year's Eve in Times Square", (12, 31), (12, 31)),
+    ],
+}
+
+# Recurring listings per city: (months they apply to, or None for the rest of the year, sections)
+RECURRING_LISTINGS = {
+    "paris": [
+        (("April", "May", "June"), {
+            "RECURRING EVENTS": [
+                "First Sunday of the month: Free admission to many museums",
+                "Louvre late openings on Wednesdays and Fridays",
+                "Marché aux Puces de Saint-Ouen (flea market) on weekends",
+                "Seine River night cruises",
+            ],
+            "EXHIBITIONS & SHOWS": [
+                "Centre Pompidou contemporary art exhibitions",
+                "Palais de Tokyo avant-garde installations",
+                "Ongoing shows at Opéra Garnier and Opéra Bastille",
+                "Moulin Rouge and Lido cabaret performances",
+            ],
+        }),
+        (("July", "August", "September"), {
+            "RECURRING EVENTS": [
+                "First Sunday of the month: Free admission to many museums",
+                "Evening boat cruises on the Seine",
+            ],
+            "EXHIBITIONS & SHOWS": [
+                "Special summer exhibitions at major museums",
+                "Outdoor photography displays along Champs Elysées",
+                "Sound and light shows at various monuments",
+            ],
+        }),
+        (None, {
+            "RECURRING EVENTS": [
+                "First Sunday of the month: Free admission to many museums",
+                "Louvre late openings on Wednesdays and Fridays",
+                "Weekend markets throughout the city",
+                "Evening performances at famous venues",
+            ],
+            "EXHIBITIONS & SHOWS": [
+                "Rotating exhibitions at Grand Palais and Petit Palais",
+                "Contemporary art at Palais de Tokyo",
+                "Opera and ballet performances",
+                "Cabaret shows at Moulin Rouge and Lido",
+            ],
+        }),
+    ],
+    "tokyo": [
+        (("March", "April", "May"), {
+            "RECURRING EVENTS": [
+                "Farmers markets at United Nations University (weekends)",
+                "Yoyogi Park events and performances (weekends)",
+                "Comiket manga and anime convention (varies)",
+            ],
+            "EXHIBITIONS & SHOWS": [
+                "TeamLab Borderless digital art exhibition",
+                "Rotating exhibits at Mori Art Museum",
+                "Tokyo National Museum special collections",
+                "Kabuki performances at Kabukiza Theatre",
+            ],
+        }),
+        (("June", "July", "August"), {
+            "RECURRING EVENTS": [
+                "Morning tuna auctions at Toyosu Market",
+                "Weekend food festivals in Yoyogi Park",
+                "Robot shows at Robot Restaurant",
+            ],
+            "EXHIBITIONS & SHOWS": [
+                "Summer illuminations at Tokyo Midtown",
+            ],
+        }),
+        (None, {
+            "RECURRING EVENTS": [
+                "Farmers markets at United Nations University (weekends)",
+                "Morning tuna auctions at Toyosu Market",
+                "Akihabara electronic district special events",
+            ],
+            "EXHIBITIONS & SHOWS": [
+                "TeamLab Borderless/Planets digital art exhibitions",
+                "Rotating exhibits at major museums",
+                "J-Pop and K-Pop concerts",
+                "Traditional theater performances",
+            ],
+        }),
+    ],
+    "new york": [
+        (("April", "May", "June"), {
+            "RECURRING EVENTS": [
+                "Broadway shows (discount tickets at TKTS booths)",
+                "Weekly food markets: Smorgasburg in Brooklyn (weekends)",
+                "Highline art installations and walking tours",
+                "Saturday Night Live tapings (seasonal)",
+            ],
+            "EXHIBITIONS & SHOWS": [
+                "Metropolitan Museum of Art special exhibitions",
+                "Whitney Museum American art collections",
+                "MoMA contemporary installations",
+                "New museum shows opening regularly",
+            ],
+        }),
+        (("July", "August", "September"), {
+            "RECURRING EVENTS": [
+                "Broadway shows (discount tickets at TKTS booths)",
+                "Free museum days (check specific museums)",
+                "Governor's Island summer activities",
+                "Staten Island Ferry (free views of Statue of Liberty)",
+                "Weekend street fairs throughout Manhattan",
+            ],
+            "EXHIBITIONS & SHOWS": [
+                "Rotating exhibitions at major museums",
+                "Rooftop bars and summer pop-ups",
+                "Concerts at Madison Square Garden",
+            ],
+        }),
+        (("October", "November", "December"), {
+            "RECURRING EVENTS": [
+                "Broadway shows (discount tickets at TKTS booths)",
+                "NFL football games (Jets/Giants, September-December)",
+                "NBA basketball games (Knicks/Nets, October-April)",
+                "NHL hockey games (Rangers/Islanders, October-April)",
+            ],
+            "EXHIBITIONS & SHOWS": [
+                "Fall/winter exhibitions at major museums",
+                "Holiday window displays on Fifth Avenue",
+                "The Nutcracker at Lincoln Center",
+            ],
+        }),
+        (None, {
+            "RECURRING EVENTS": [
+                "Broadway shows (discount tickets at TKTS booths)",
+                "Free museum days (check specific museums)",
+                "Live TV show tapings (The Tonight Show, Late Show, etc.)",
+                "NYC Restaurant Week (winter and summer)",
+                "Weekly comedy shows",
+            ],
+            "EXHIBITIONS & SHOWS": [
+                "Major exhibitions at Metropolitan Museum of Art",
+                "MoMA contemporary art displays",
+                "Live music in Greenwich Village and Brooklyn",
+                "Off-Broadway theatrical productions",
+            ],
+        }),
+    ],
+}
+
+# Shared calendar of dated events, indexed per city
+event_calendar = EventCalendar()
+for city, city_events in ANNUAL_EVENTS.items():
+    for name, start_month_day, end_month_day in city_events:
+        event_calendar.add_annual_event(city, name, start_month_day, end_month_day)
 
 # Create the events agent
 events_agent = Agent(
@@ -24,233 +232,84 @@ async def startup(ctx: Context):
 @events_agent.on_message(model=EventsRequest)
 async def handle_events_request(ctx: Context, sender: str, msg: EventsRequest):
     ctx.logger.info(f"Received events request for {msg.destination} from {msg.start_date} to {msg.end_date}")
-    
+
     # Parse dates
     start_date = datetime.strptime(msg.start_date, "%Y-%m-%d")
     end_date = datetime.strptime(msg.end_date, "%Y-%m-%d")
-    
-    # Get events information
-    events_info = get_events(msg.destination, start_date, end_date)
-    
-    # Create and send the response
-    response = EventsResponse(events=events_info)
-    await ctx.send(sender, response)
-
-def get_events(destination, start_date, end_date):
-    """Get events for a given destination and date range."""
-    destination = destination.lower()
-    
-    # Determine month name for the start date
-    month_name = start_date.strftime("%B")
-    year = start_date.year
-    
-    # Default events info
-    events_info = f"LOCAL EVENTS IN {destination.upper()} DURING YOUR STAY:\n\n"
-    
-    # Add note about simulation
-    events_info += "Note: In an actual implementation, this would connect to event APIs for real-time events.\n\n"
-    
-    # Customize based on popular destinations and month
-    if "paris" in destination:
-        if month_name in ["April", "May", "June"]:
-            events_info += f"""
-SEASONAL HIGHLIGHTS ({month_name}):
-- French Open Tennis Tournament (Late May-Early June)
-- Paris Jazz Festival (June)
-- Fête de la Musique (June 21) - Free music throughout the city
-- Spring flower displays at Jardin des Tuileries and Luxembourg Gardens
-
-RECURRING EVENTS:
-- First Sunday of the month: Free admission to many museums
-- Louvre late openings on Wednesdays and Fridays
-- Marché aux Puces de Saint-Ouen (flea market) on weekends
-- Seine River night cruises
-
-EXHIBITIONS & SHOWS:
-- Centre Pompidou contemporary art exhibitions
-- Palais de Tokyo avant-garde installations
-- Ongoing shows at Opéra Garnier and Opéra Bastille
-- Moulin Rouge and Lido cabaret performances
-"""
-        elif month_name in ["July", "August", "September"]:
-            events_info += f"""
-SEASONAL HIGHLIGHTS ({month_name}):
-- Bastille Day Celebrations (July 14)
-- Paris Plages (July-August) - Seine riverside beaches
-- Open-air cinema at Parc de la Villette (July-August)
-- European Heritage Days (September) - Access to normally closed buildings
-
-RECURRING EVENTS:
-- First Sunday of the month: Free admission to many museums
-- Outdoor concerts in Parc Floral (summer)
-- Evening boat cruises on the Seine
-- Rock en Seine music festival (late August)
-- Fashion Week (late September)
-
-EXHIBITIONS & SHOWS:
-- Special summer exhibitions at major museums
-- Outdoor photography displays along Champs Elysées
-- Sound and light shows at various monuments
-"""
-        else:
-            events_info += """
-RECURRING EVENTS:
-- First Sunday of the month: Free admission to many museums
-- Louvre late openings on Wednesdays and Fridays
-- Weekend markets throughout the city
-- Evening performances at famous venues
 
-EXHIBITIONS & SHOWS:
-- Rotating exhibitions at Grand Palais and Petit Palais
-- Contemporary art at Palais de Tokyo
-- Opera and ballet performances
-- Cabaret shows at Moulin Rouge and Lido
-"""
-    
-    elif "tokyo" in destination:
-        if month_name in ["March", "April", "May"]:
-            events_info += f"""
-SEASONAL HIGHLIGHTS ({month_name}):
-- Cherry Blossom (Sakura) Season (Late March-Early April)
-- Hanami parties in major parks
-- Kanamara Matsuri Festival (April) in Kawasaki
-- Sanja Matsuri in Asakusa (May)
-- Golden Week holidays (Late April-Early May)
+    # Get events information
+    event_list = find_events(msg.destination, start_date, end_date)
+    events_info = get_events(msg.destination, start_date, end_date, event_list)
 
-RECURRING EVENTS:
-- Sumo tournaments (January, May, September)
-- Farmers markets at United Nations University (weekends)
-- Yoyogi Park events and performances (weekends)
-- Comiket manga and anime convention (varies)
+    # Create and send the response
+    response = EventsResponse(events=events_info, event_list=event_list)
+    await reply(ctx, sender, response)
 
-EXHIBITIONS & SHOWS:
-- TeamLab Borderless digital art exhibition
-- Rotating exhibits at Mori Art Museum
-- Tokyo National Museum special collections
-- Kabuki performances at Kabukiza Theatre
-"""
-        elif month_name in ["June", "July", "August"]:
-            events_info += f"""
-SEASONAL HIGHLIGHTS ({month_name}):
-- Rainy season (June) with hydrangea blooms
-- Sumidagawa Fireworks Festival (July)
-- Tanabata Festival (July 7)
-- Obon Festival (mid-August)
-- Summer festivals (matsuri) throughout the city
+# Accept EventsRequest as a compact payload from peers that negotiate it
+enable_compact_payloads(events_agent, {EventsRequest: handle_events_request})
 
-RECURRING EVENTS:
-- Sumo tournaments (May, September)
-- Morning tuna auctions at Toyosu Market
-- Weekend food festivals in Yoyogi Park
-- Robot shows at Robot Restaurant
+def match_city(destination):
+    """Return the calendar city key contained in a destination string, if any."""
+    destination = destination.lower()
+    return next((city for city in ANNUAL_EVENTS if city in destination), None)
 
-EXHIBITIONS & SHOWS:
-- Summer illuminations at Tokyo Midtown
-- Fuji Rock Festival (late July)
-- Tokyo Jazz Festival (late August/early September)
-- Summer sonic music festival (mid-August)
-"""
-        else:
-            events_info += """
-RECURRING EVENTS:
-- Sumo tournaments (January, May, September)
-- Farmers markets at United Nations University (weekends)
-- Morning tuna auctions at Toyosu Market
-- Akihabara electronic district special events
+def find_events(destination, start_date, end_date):
+    """Return dated events overlapping the stay as dicts sorted by start date."""
+    city = match_city(destination)
+    if city is None:
+        return []
+    return event_calendar.events_between(city, start_date.date(), end_date.date())
 
-EXHIBITIONS & SHOWS:
-- TeamLab Borderless/Planets digital art exhibitions
-- Rotating exhibits at major museums
-- J-Pop and K-Pop concerts
-- Traditional theater performances
-"""
-    
-    elif "new york" in destination:
-        if month_name in ["April", "May", "June"]:
-            events_info += f"""
-SEASONAL HIGHLIGHTS ({month_name}):
-- Tribeca Film Festival (April)
-- Cherry Blossom Festival at Brooklyn Botanic Garden (April)
-- Frieze Art Fair (May)
-- Shakespeare in the Park (June-August)
-- Pride March and Festival (June)
-- Museum Mile Festival (June)
+def format_event_dates(event):
+    start = datetime.strptime(event["start"], "%Y-%m-%d")
+    end = datetime.strptime(event["end"], "%Y-%m-%d")
+    if start == end:
+        return start.strftime("%b %d")
+    return f"{start.strftime('%b %d')} - {end.strftime('%b %d')}"
 
-RECURRING EVENTS:
-- Broadway shows (discount tickets at TKTS booths)
-- Free summer concerts in Central Park
-- Weekly food markets: Smorgasburg in Brooklyn (weekends)
-- Highline art installations and walking tours
-- Saturday Night Live tapings (seasonal)
+def get_recurring_sections(city, months):
+    """Merge the recurring listings for every season the stay touches, without repeats."""
+    seasons = RECURRING_LISTINGS[city]
+    default = next(listings for season_months, listings in seasons if season_months is None)
+    chosen = []
+    for month in months:
+        listings = next(
+            (listings for season_months, listings in seasons if season_months and month in season_months),
+            default,
+        )
+        if listings not in chosen:
+            chosen.append(listings)
 
-EXHIBITIONS & SHOWS:
-- Metropolitan Museum of Art special exhibitions
-- Whitney Museum American art collections
-- MoMA contemporary installations
-- New museum shows opening regularly
-"""
-        elif month_name in ["July", "August", "September"]:
-            events_info += f"""
-SEASONAL HIGHLIGHTS ({month_name}):
-- Macy's 4th of July Fireworks
-- Restaurant Week (late July/early August)
-- US Open Tennis (August-September)
-- Summer concerts in Central Park
-- Outdoor movies in Bryant Park (summer)
-- San Gennaro Festival in Little Italy (September)
-- Fashion Week (September)
+    sections = {}
+    for listings in chosen:
+        for header, items in listings.items():
+            merged = sections.setdefault(header, [])
+            merged.extend(item for item in items if item not in merged)
+    return sections
 
-RECURRING EVENTS:
-- Broadway shows (discount tickets at TKTS booths)
-- Free museum days (check specific museums)
-- Governor's Island summer activities
-- Staten Island Ferry (free views of Statue of Liberty)
-- Weekend street fairs throughout Manhattan
+def get_events(destination, start_date, end_date, event_list=None):
+    """Get events for a given destination and date range."""
+    city = match_city(destination)
+    if event_list is None:
+        event_list = find_events(destination, start_date, end_date)
+    destination = destination.lower()
 
-EXHIBITIONS & SHOWS:
-- Rotating exhibitions at major museums
-- Rooftop bars and summer pop-ups
-- Shakespeare in the Park performances
-- Concerts at Madison Square Garden
-"""
-        elif month_name in ["October", "November", "December"]:
-            events_info += f"""
-SEASONAL HIGHLIGHTS ({month_name}):
-- New York Film Festival (October)
-- Village Halloween Parade (October 31)
-- Macy's Thanksgiving Day Parade (November)
-- Rockefeller Center Christmas Tree Lighting (early December)
-- New Year's Eve in Times Square (December 31)
-- Holiday markets at Bryant Park, Union Square, and Columbus Circle
+    # Default events info
+    events_info = f"LOCAL EVENTS IN {destination.upper()} DURING YOUR STAY:\n\n"
 
-RECURRING EVENTS:
-- Broadway shows (discount tickets at TKTS booths)
-- NFL football games (Jets/Giants, September-December)
-- NBA basketball games (Knicks/Nets, October-April)
-- NHL hockey games (Rangers/Islanders, October-April)
+    # Add note about simulation
+    events_info += "Note: In an actual implementation, this would connect to event APIs for real-time events.\n\n"
 
-EXHIBITIONS & SHOWS:
-- Fall/winter exhibitions at major museums
-- Holiday window displays on Fifth Avenue
-- Radio City Christmas Spectacular
-- The Nutcracker at Lincoln Center
-"""
-        else:
-            events_info += """
-RECURRING EVENTS:
-- Broadway shows (discount tickets at TKTS booths)
-- Free museum days (check specific museums)
-- Live TV show tapings (The Tonight Show, Late Show, etc.)
-- NYC Restaurant Week (winter and summer)
-- Weekly comedy shows
+    # Customize based on popular destinations and the months covered by the stay
+    if city:
+        months = month_span(start_date, end_date)
+        if event_list:
+            events_info += f"\nSEASONAL HIGHLIGHTS ({', '.join(months)}):\n"
+            for event in event_list:
+                events_info += f"- {event['name']} ({format_event_dates(event)})\n"
+        for header, items in get_recurring_sections(city, months).items():
+            events_info += f"\n{header}:\n" + "".join(f"- {item}\n" for item in items)
 
-EXHIBITIONS & SHOWS:
-- Major exhibitions at Metropolitan Museum of Art
-- MoMA contemporary art displays
-- Live music in Greenwich Village and Brooklyn
-- Off-Broadway theatrical productions
-"""
-    
     else:
         # Generic events for any destination
         events_info += f"""
@@ -280,8 +339,8 @@ CULTURAL OPPORTUNITIES:
 - Gallery openings and art walks
 - Food festivals and culinary events
 """
-    
+
     return events_info
 
 if __name__ == "__main__":
-    events_agent.run() 
\ No newline at end of file
+    events_agent.run()
@@ -0,0 +1,179 @@
+from array import array
+from datetime import timedelta
+
+# Nights covered by the rolling calendar window
+DEFAULT_WINDOW_DAYS = 365
+
+class HotelAvailability:
+    """Per-night hotel availability and pricing over a rolling window of nights.
+
+    Each city keeps one bitset per night (a Python int, bit i set when the city's i-th
+    hotel is free that night), and each hotel keeps its nightly prices plus their prefix
+    sums. "Which hotels are free every night of a stay" is an AND of the stay's night
+    bitsets, and a stay's total price is a difference of two prefix sums. Every change
+    bumps the city's version counter.
+    """
+
+    def __init__(self, window_start, window_days=DEFAULT_WINDOW_DAYS):
+        self.window_start = window_start
+        self.window_days = window_days
+        self._nights = {}
+        self._all = {}
+        self._hotels = {}
+        self._bit = {}
+        self._city_of = {}
+        self._base_price = {}
+        self._prices = {}
+        self._prefix = {}
+        self._versions = {}
+
+    def cities(self):
+        return list(self._nights)
+
+    def version(self, city):
+        """Counter that changes whenever availability or prices in the city change."""
+        return self._versions.get(city, 0)
+
+    def __contains__(self, hotel_id):
+        return hotel_id in self._city_of
+
+    def covers(self, check_in, check_out):
+        """True if every night of the stay [check_in, check_out) is inside the window."""
+        return self.window_start <= check_in < check_out <= self.window_end
+
+    @property
+    def window_end(self):
+        return self.window_start + timedelta(days=self.window_days)
+
+    def add_hotel(self, city, hotel_id, price_per_night):
+        """Add a hotel that is free every night of the window at price_per_night."""
+        if hotel_id in self._city_of:
+            raise ValueError(f"Hotel {hotel_id} is already tracked")
+        hotels = self._hotels.setdefault(city, [])
+        if city not in self._nights:
+            self._nights[city] = [0] * self.window_days
+            self._all[city] = 0
+        bit = 1 << len(hotels)
+        hotels.append(hotel_id)
+        self._bit[hotel_id] = bit
+        self._city_of[hotel_id] = city
+        self._all[city] |= bit
+        nights = self._nights[city]
+        for night in range(self.window_days):
+            nights[night] |= bit
+        self._base_price[hotel_id] = price_per_night
+        self._prices[hotel_id] = array("d", [price_per_night]) * self.window_days
+        self._rebuild_prefix(hotel_id)
+        self._touch(city)
+
+    def remove_hotel(self, hotel_id):
+        city = self._city_of.pop(hotel_id)
+        bit = self._bit.pop(hotel_id)
+        # The bit position is left unused rather than renumbering the city's hotels
+        self._hotels[city][bit.bit_length() - 1] = None
+        self._all[city] &= ~bit
+        nights = self._nights[city]
+        for night in range(self.window_days):
+            nights[night] &= ~bit
+        del self._base_price[hotel_id], self._prices[hotel_id], self._prefix[hotel_id]
+        self._touch(city)
+
+    def set_base_price(self, hotel_id, price_per_night):
+        """Change a hotel's base price and reprice every night of the window at it."""
+        self._base_price[hotel_id] = price_per_night
+        self.set_price(hotel_id, self.window_start, self.window_end, price_per_night)
+
+    def base_price(self, hotel_id):
+        return self._base_price[hotel_id]
+
+    def set_available(self, hotel_id, start, end, available):
+        """Mark the nights [start, end) of a hotel as free or booked (clipped to the window)."""
+        first, last = self._clip(start, end)
+        bit = self._bit[hotel_id]
+        nights = self._nights[self._city_of[hotel_id]]
+        for night in range(first, last):
+            nights[night] = nights[night] | bit if available else nights[night] & ~bit
+        self._touch(self._city_of[hotel_id])
+
+    def set_price(self, hotel_id, start, end, price):
+        """Set the nightly price of a hotel for the nights [start, end) (clipped to the window)."""
+        first, last = self._clip(start, end)
+        prices = self._prices[hotel_id]
+        for night in range(first, last):
+            prices[night] = price
+        self._rebuild_prefix(hotel_id)
+        self._touch(self._city_of[hotel_id])
+
+    def stay_price(self, hotel_id, check_in, check_out):
+        first, last = self._stay(check_in, check_out)
+        prefix = self._prefix[hotel_id]
+        return round(prefix[last] - prefix[first], 2)
+
+    def available_hotels(self, city, check_in, check_out, max_total=None):
+        """Return (hotel id, total price) for hotels free every night of the stay, cheapest first.
+
+        Hotels whose total for the stay exceeds max_total are left out. Raises ValueError
+        if the stay is not inside the window.
+        """
+        first, last = self._stay(check_in, check_out)
+        nights = self._nights.get(city)
+        if not nights:
+            return []
+        mask = self._all[city]
+        for night in range(first, last):
+            mask &= nights[night]
+            if not mask:
+                return []
+
+        hotels = self._hotels[city]
+        results = []
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            hotel_id = hotels[low.bit_length() - 1]
+            prefix = self._prefix[hotel_id]
+            total = round(prefix[last] - prefix[first], 2)
+            if max_total is None or total <= max_total:
+                results.append((total, hotel_id))
+        results.sort()
+        return [(hotel_id, total) for total, hotel_id in results]
+
+    def advance(self, window_start):
+        """Move the window forward to start at window_start.
+
+        Nights that fall off the front are dropped; new nights at the end start free at
+        each hotel's base price.
+        """
+        shift = (window_start - self.window_start).days
+        if shift <= 0:
+            return
+        shift = min(shift, self.window_days)
+        for city, nights in self._nights.items():
+            self._nights[city] = nights[shift:] + [self._all[city]] * shift
+        for hotel_id, prices in self._prices.items():
+            self._prices[hotel_id] = prices[shift:] + array("d", [self._base_price[hotel_id]]) * shift
+            self._rebuild_prefix(hotel_id)
+        self.window_start = window_start
+        for city in self._nights:
+            self._touch(city)
+
+    def _touch(self, city):
+        self._versions[city] = self._versions.get(city, 0) + 1
+
+    def _rebuild_prefix(self, hotel_id):
+        prefix = array("d", [0.0]) * (self.window_days + 1)
+        running = 0.0
+        for night, price in enumerate(self._prices[hotel_id]):
+            running += price
+            prefix[night + 1] = running
+        self._prefix[hotel_id] = prefix
+
+    def _stay(self, check_in, check_out):
+        if not self.covers(check_in, check_out):
+            raise ValueError(f"Stay {check_in} to {check_out} is outside the availability window")
+        return (check_in - self.window_start).days, (check_out - self.window_start).days
+
+    def _clip(self, start, end):
+        first = max((start - self.window_start).days, 0)
+        last = min((end - self.window_start).days, self.window_days)
+        return first, max(first, last)
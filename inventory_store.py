@@ -0,0 +1,258 @@
+from array import array
+from collections import deque
+from bisect import bisect_left, bisect_right
+
+
+class PriceIndex:
+    """(price, offer id) keys kept sorted in bounded blocks of typed arrays.
+
+    Each block holds at most 2 * BLOCK_SIZE entries as two parallel arrays (8 bytes
+    per price, 8 per id), and the last key of every block is kept in a separate list.
+    Finding a key is a binary search over the block maxima and one within the block,
+    and an insert or delete only shifts entries inside one block.
+    """
+
+    BLOCK_SIZE = 512
+
+    def __init__(self):
+        self._prices = []
+        self._ids = []
+        self._maxes = []
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def load_sorted(self, keys):
+        """Replace the contents with already sorted (price, offer id) keys."""
+        self._prices, self._ids, self._maxes = [], [], []
+        for start in range(0, len(keys), self.BLOCK_SIZE):
+            chunk = keys[start:start + self.BLOCK_SIZE]
+            self._prices.append(array("d", (price for price, _ in chunk)))
+            self._ids.append(array("q", (offer_id for _, offer_id in chunk)))
+            self._maxes.append(chunk[-1])
+        self._len = len(keys)
+
+    def insert(self, price, offer_id):
+        key = (price, offer_id)
+        if not self._maxes:
+            self._prices.append(array("d", [price]))
+            self._ids.append(array("q", [offer_id]))
+            self._maxes.append(key)
+            self._len = 1
+            return
+        block = min(bisect_left(self._maxes, key), len(self._maxes) - 1)
+        prices, ids = self._prices[block], self._ids[block]
+        position = self._position(prices, ids, price, offer_id)
+        prices.insert(position, price)
+        ids.insert(position, offer_id)
+        self._maxes[block] = (prices[-1], ids[-1])
+        self._len += 1
+        if len(ids) > 2 * self.BLOCK_SIZE:
+            self._split(block)
+
+    def remove(self, price, offer_id):
+        block = bisect_left(self._maxes, (price, offer_id))
+        if block == len(self._maxes):
+            raise KeyError((price, offer_id))
+        prices, ids = self._prices[block], self._ids[block]
+        position = self._position(prices, ids, price, offer_id)
+        if position == len(ids) or ids[position] != offer_id:
+            raise KeyError((price, offer_id))
+        del prices[position]
+        del ids[position]
+        self._len -= 1
+        if ids:
+            self._maxes[block] = (prices[-1], ids[-1])
+        else:
+            del self._prices[block], self._ids[block], self._maxes[block]
+
+    def first(self):
+        return self._ids[0][0] if self._len else None
+
+    def ids(self, max_price=None):
+        """Yield offer ids cheapest first, stopping after max_price if given."""
+        for prices, ids in zip(self._prices, self._ids):
+            if max_price is not None and prices[-1] > max_price:
+                yield from ids[:bisect_right(prices, max_price)]
+                return
+            yield from ids
+
+    def _split(self, block):
+        prices, ids = self._prices[block], self._ids[block]
+        half = len(ids) // 2
+        self._prices[block:block + 1] = [prices[:half], prices[half:]]
+        self._ids[block:block + 1] = [ids[:half], ids[half:]]
+        self._maxes[block:block + 1] = [(prices[half - 1], ids[half - 1]), (prices[-1], ids[-1])]
+
+    @staticmethod
+    def _position(prices, ids, price, offer_id):
+        # Entries are ordered by (price, offer id): find the run of equal prices, then
+        # the offer id within it
+        low = bisect_left(prices, price)
+        high = bisect_right(prices, price, low)
+        return bisect_left(ids, offer_id, low, high)
+
+
+class OfferStore:
+    """In-memory offer inventory indexed by destination and kept sorted by price.
+
+    Rows are stored as plain tuples laid out in `fields` order and addressed by a
+    dense integer offer id; each destination has its own PriceIndex. The cheapest
+    offer is O(1), the k cheapest are O(k), and inserts, updates and removals are
+    O(log n) searches plus a shift inside one bounded block. Every change bumps the
+    destination's version counter, so callers can tell when cached answers are stale,
+    and is kept in a bounded per-destination change log, so derived indexes can catch
+    up one offer at a time with changes_since().
+    """
+
+    # Changes remembered per destination; callers further behind than this rebuild
+    CHANGE_LOG_SIZE = 4096
+
+    def __init__(self, fields, price_field="price"):
+        self.fields = tuple(fields)
+        self.price_field = price_field
+        self._price_pos = self.fields.index(price_field)
+        self._rows = []
+        self._destinations = []
+        self._indexes = {}
+        self._versions = {}
+        self._changes = {}
+
+    @classmethod
+    def from_records(cls, records_by_destination, fields, price_field="price"):
+        """Build a store from {destination: [record dict, ...]}."""
+        store = cls(fields, price_field)
+        for destination, records in records_by_destination.items():
+            store.add_many(destination, records)
+        return store
+
+    def __len__(self):
+        return sum(len(index) for index in self._indexes.values())
+
+    def destinations(self):
+        return list(self._indexes)
+
+    def count(self, destination):
+        index = self._indexes.get(destination)
+        return len(index) if index else 0
+
+    def version(self, destination):
+        """Counter that changes whenever the destination's offers change."""
+        return self._versions.get(destination, 0)
+
+    def changes_since(self, destination, version):
+        """Return {offer id: changed fields} for the destination's changes after version.
+
+        The fields are None for offers that were added or removed. Returns None when the
+        change log no longer reaches back to version, so the caller has to rebuild.
+        """
+        if version == self.version(destination):
+            return {}
+        log = self._changes.get(destination)
+        if not log or log[0][0] > version + 1:
+            return None
+        changes = {}
+        for change_version, offer_ids, fields in log:
+            if change_version <= version:
+                continue
+            for offer_id in offer_ids:
+                known = changes.get(offer_id, frozenset())
+                changes[offer_id] = None if fields is None or known is None else known | fields
+        return changes
+
+    def add(self, destination, record):
+        """Add an offer (a dict with every field) and return its offer id."""
+        offer_id = self._append_row(destination, record)
+        self._index_for(destination).insert(self._rows[offer_id][self._price_pos], offer_id)
+        self._touch(destination, (offer_id,))
+        return offer_id
+
+    def add_many(self, destination, records):
+        """Bulk-add offers for one destination with a single sort; returns their offer ids."""
+        offer_ids = [self._append_row(destination, record) for record in records]
+        index = self._index_for(destination)
+        keys = [(self._rows[offer_id][self._price_pos], offer_id) for offer_id in index.ids()]
+        keys.extend((self._rows[offer_id][self._price_pos], offer_id) for offer_id in offer_ids)
+        keys.sort()
+        index.load_sorted(keys)
+        self._touch(destination, offer_ids)
+        return offer_ids
+
+    def update(self, offer_id, **changes):
+        """Change fields of an existing offer, re-positioning it if the price moved."""
+        row = self._live_row(offer_id)
+        values = list(row)
+        for field, value in changes.items():
+            values[self.fields.index(field)] = value
+        new_row = tuple(values)
+        if new_row[self._price_pos] != row[self._price_pos]:
+            index = self._indexes[self._destinations[offer_id]]
+            index.remove(row[self._price_pos], offer_id)
+            index.insert(new_row[self._price_pos], offer_id)
+        self._rows[offer_id] = new_row
+        self._touch(self._destinations[offer_id], (offer_id,), frozenset(changes))
+
+    def remove(self, offer_id):
+        row = self._live_row(offer_id)
+        self._indexes[self._destinations[offer_id]].remove(row[self._price_pos], offer_id)
+        self._rows[offer_id] = None
+        self._touch(self._destinations[offer_id], (offer_id,))
+
+    def get(self, offer_id):
+        return self._as_record(self._live_row(offer_id))
+
+    def destination_of(self, offer_id):
+        self._live_row(offer_id)
+        return self._destinations[offer_id]
+
+    def cheapest(self, destination):
+        """Return the cheapest offer for a destination, or None if there are none."""
+        index = self._indexes.get(destination)
+        if not index:
+            return None
+        return self._as_record(self._rows[index.first()])
+
+    def top_k(self, destination, k):
+        """Return the k cheapest offers for a destination, cheapest first."""
+        records = []
+        for _, record in self.offers(destination):
+            if len(records) == k:
+                break
+            records.append(record)
+        return records
+
+    def offers(self, destination, max_price=None):
+        """Yield (offer id, record) pairs for a destination in price order, optionally capped."""
+        index = self._indexes.get(destination)
+        if not index:
+            return
+        for offer_id in index.ids(max_price):
+            yield offer_id, self._as_record(self._rows[offer_id])
+
+    def _append_row(self, destination, record):
+        self._rows.append(tuple(record[field] for field in self.fields))
+        self._destinations.append(destination)
+        return len(self._rows) - 1
+
+    def _touch(self, destination, offer_ids, fields=None):
+        version = self._versions[destination] = self._versions.get(destination, 0) + 1
+        log = self._changes.get(destination)
+        if log is None:
+            log = self._changes[destination] = deque(maxlen=self.CHANGE_LOG_SIZE)
+        log.append((version, offer_ids, fields))
+
+    def _index_for(self, destination):
+        index = self._indexes.get(destination)
+        if index is None:
+            index = self._indexes[destination] = PriceIndex()
+        return index
+
+    def _as_record(self, row):
+        return dict(zip(self.fields, row))
+
+    def _live_row(self, offer_id):
+        row = self._rows[offer_id] if 0 <= offer_id < len(self._rows) else None
+        if row is None:
+            raise KeyError(f"Unknown offer id {offer_id}")
+        return row
@@ -0,0 +1,109 @@
+import re
+import unicodedata
+
+# Words that carry no preference on their own
+STOPWORDS = frozenset({
+    "a", "an", "and", "the", "of", "for", "with", "in", "on", "to", "at", "or",
+    "some", "lots", "good", "great", "nice", "love", "like", "really", "very",
+})
+
+# Canonical term -> words treated as the same preference
+SYNONYMS = {
+    "food": ("cuisine", "culinary", "dining", "eating", "gastronomy", "foodie", "restaurant"),
+    "culture": ("cultural", "tradition", "traditional", "heritage"),
+    "history": ("historic", "historical", "ancient", "archaeology", "ruins"),
+    "art": ("arts", "gallery", "painting", "artistic"),
+    "museum": ("museums", "exhibition"),
+    "technology": ("tech", "robot", "robots", "gadget", "futuristic"),
+    "nature": ("outdoor", "outdoors", "scenery", "mountain", "park"),
+    "nightlife": ("night", "bar", "bars", "club", "clubs", "party"),
+    "sightseeing": ("sights", "landmark", "landmarks", "views", "view", "panorama"),
+    "cooking": ("cook", "class", "workshop"),
+    "walking": ("walk", "stroll", "hiking", "hike"),
+}
+
+# Suffixes removed by stem(), longest first
+_SUFFIXES = ("ational", "ation", "ies", "ied", "ing", "al", "es", "ed", "s")
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+def stem(word):
+    """Strip one common English suffix and a trailing "e" (cultural, culture -> cultur).
+
+    Words ending in "ss" keep their suffix so that "class" and "classes" agree.
+    """
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3 and not word.endswith("ss"):
+            word = word[:-len(suffix)] + ("y" if suffix in ("ies", "ied") else "")
+            break
+    if word.endswith("e") and len(word) > 3:
+        word = word[:-1]
+    return word
+
+# Stemmed synonym -> stemmed canonical term
+_CANONICAL = {}
+for canonical, words in SYNONYMS.items():
+    for word in (canonical, *words):
+        _CANONICAL.setdefault(stem(word), stem(canonical))
+
+def terms(text):
+    """Normalize free text to a set of index terms: lowercase, accents removed, stemmed, synonyms folded."""
+    text = unicodedata.normalize("NFKD", text.lower()).encode("ascii", "ignore").decode("ascii")
+    found = set()
+    for word in _WORD.findall(text):
+        if word in STOPWORDS:
+            continue
+        term = stem(word)
+        found.add(_CANONICAL.get(term, term))
+    return found
+
+class KeywordIndex:
+    """Inverted index from normalized terms to item ids, kept separately per destination.
+
+    search() walks only the posting lists of the query's terms, so its cost grows with
+    the number of matching items rather than with the size of the catalog.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._item_terms = {}
+
+    def add(self, destination, item_id, text):
+        """Index an item's text (replacing whatever was indexed for it before)."""
+        self.remove(destination, item_id)
+        item_terms = terms(text)
+        postings = self._postings.setdefault(destination, {})
+        for term in item_terms:
+            postings.setdefault(term, set()).add(item_id)
+        self._item_terms[(destination, item_id)] = item_terms
+
+    def remove(self, destination, item_id):
+        item_terms = self._item_terms.pop((destination, item_id), ())
+        postings = self._postings.get(destination, {})
+        for term in item_terms:
+            ids = postings[term]
+            ids.discard(item_id)
+            if not ids:
+                del postings[term]
+
+    def __contains__(self, key):
+        return key in self._item_terms
+
+    def destinations(self):
+        return list(self._postings)
+
+    def matches(self, destination, query):
+        """Return {item id: number of distinct query terms it matches} for items matching any."""
+        postings = self._postings.get(destination)
+        counts = {}
+        if not postings:
+            return counts
+        for term in terms(query):
+            for item_id in postings.get(term, ()):
+                counts[item_id] = counts.get(item_id, 0) + 1
+        return counts
+
+    def search(self, destination, query, limit=None):
+        """Return (item id, score) pairs ranked by term overlap, best first."""
+        ranked = sorted(self.matches(destination, query).items(), key=lambda pair: (-pair[1], pair[0]))
+        return ranked if limit is None else ranked[:limit]
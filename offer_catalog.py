@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""Columnar, memory-mapped offer catalogs built from supplier CSV/JSONL dumps.
+
+A catalog is a directory with one file per column plus a small manifest:
+
+    catalog.json         row count, column types and each destination's row range
+    <field>.f64          float columns: packed little-endian doubles
+    <field>.off/.str     text columns: int64 start offsets (rows + 1) into a UTF-8 blob
+
+Rows are sorted by destination and then price, so a destination's offers are one
+contiguous, price-ordered row range. Opening a catalog only reads the manifest; the
+column files are memory-mapped read-only, so pages load on first touch and agent
+processes opening the same catalog share them through the OS page cache.
+
+Build one with:
+
+    python offer_catalog.py flights flights.jsonl catalogs/flights
+"""
+import argparse
+import csv
+import json
+import mmap
+import os
+import sys
+from array import array
+from bisect import bisect_right
+
+MANIFEST = "catalog.json"
+FORMAT_VERSION = 1
+
+# Column types: "float" for numbers, "str" for text, "list" for lists of strings
+# (stored as text joined by LIST_SEPARATOR; in CSV files write them joined by "|")
+LIST_SEPARATOR = "\x1f"
+CSV_LIST_SEPARATOR = "|"
+
+FLIGHT_COLUMNS = {
+    "airline": "str",
+    "flight_number": "str",
+    "departure_time": "str",
+    "arrival_time": "str",
+    "price": "float",
+}
+HOTEL_COLUMNS = {"name": "str", "address": "str", "price_per_night": "float"}
+ACTIVITY_COLUMNS = {"name": "str", "price": "float", "tags": "list"}
+
+# Column layout and price column for each kind of offer file
+CATALOG_KINDS = {
+    "flights": (FLIGHT_COLUMNS, "price"),
+    "hotels": (HOTEL_COLUMNS, "price_per_night"),
+    "activities": (ACTIVITY_COLUMNS, "price"),
+}
+
+def read_offer_records(path):
+    """Yield offer dicts from a .csv or .jsonl file (every row carries a "destination")."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+def build_catalog(records, directory, columns, price_field="price", destination_field="destination"):
+    """Write records (an iterable of dicts) as a columnar catalog in directory.
+
+    Records are gathered column by column rather than kept as dicts, sorted once by
+    (destination, price) and written out. Returns the number of rows written.
+    """
+    if columns.get(price_field) != "float":
+        raise ValueError(f"Price column {price_field!r} must be a float column")
+    destinations = []
+    values = {field: [] for field in columns}
+    converters = {field: _converter(kind) for field, kind in columns.items()}
+    for record in records:
+        destinations.append(record[destination_field])
+        for field, convert in converters.items():
+            values[field].append(convert(record[field]))
+
+    prices = values[price_field]
+    order = sorted(range(len(destinations)), key=lambda i: (destinations[i], prices[i]))
+
+    os.makedirs(directory, exist_ok=True)
+    for field, kind in columns.items():
+        column = values[field]
+        if kind == "float":
+            with open(os.path.join(directory, f"{field}.f64"), "wb") as f:
+                array("d", (column[i] for i in order)).tofile(f)
+        else:
+            _write_text_column(directory, field, (column[i] for i in order))
+
+    ranges = {}
+    for row, i in enumerate(order):
+        destination = destinations[i]
+        if destination in ranges:
+            ranges[destination][1] = row + 1
+        else:
+            ranges[destination] = [row, row + 1]
+
+    manifest = {
+        "version": FORMAT_VERSION,
+        "rows": len(order),
+        "price_field": price_field,
+        "columns": columns,
+        "destinations": ranges,
+    }
+    with open(os.path.join(directory, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    return len(order)
+
+def _converter(kind):
+    if kind == "float":
+        return float
+    if kind == "str":
+        return str
+    if kind == "list":
+        return lambda value: LIST_SEPARATOR.join(
+            value.split(CSV_LIST_SEPARATOR) if isinstance(value, str) else value
+        )
+    raise ValueError(f"Unknown column type {kind!r}")
+
+def _write_text_column(directory, field, texts):
+    offsets = array("q", [0])
+    with open(os.path.join(directory, f"{field}.str"), "wb") as blob:
+        position = 0
+        for text in texts:
+            encoded = text.encode("utf-8")
+            blob.write(encoded)
+            position += len(encoded)
+            offsets.append(position)
+    with open(os.path.join(directory, f"{field}.off"), "wb") as f:
+        offsets.tofile(f)
+
+class OfferCatalog:
+    """Read-only view of a catalog directory with the query interface of OfferStore.
+
+    Offer ids are row numbers. cheapest() reads one row, top_k() reads k rows, and
+    offers(max_price=...) binary-searches the price column inside the destination's
+    row range. Records are decoded from the mapped columns only when they are asked for.
+    """
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported catalog version {manifest['version']} in {directory}")
+        self.directory = directory
+        self.fields = tuple(manifest["columns"])
+        self.price_field = manifest["price_field"]
+        self._kinds = manifest["columns"]
+        self._rows = manifest["rows"]
+        self._ranges = {destination: tuple(span) for destination, span in manifest["destinations"].items()}
+        self._maps = []
+        self._views = []
+        self._columns = {}
+        for field, kind in self._kinds.items():
+            if kind == "float":
+                self._columns[field] = self._view(self._map(f"{field}.f64").cast("d"))
+            else:
+                offsets = self._view(self._map(f"{field}.off").cast("q"))
+                self._columns[field] = (offsets, self._map(f"{field}.str"))
+        self._prices = self._columns[self.price_field]
+
+    def _map(self, filename):
+        with open(os.path.join(self.directory, filename), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(b"")
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return self._view(memoryview(mapped))
+
+    def _view(self, view):
+        self._views.append(view)
+        return view
+
+    def close(self):
+        """Unmap the column files; the catalog cannot be queried afterwards."""
+        self._columns.clear()
+        self._prices = None
+        # Views must be released, newest first, before their mappings can close
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+        for mapped in self._maps:
+            mapped.close()
+        self._maps.clear()
+
+    def __len__(self):
+        return self._rows
+
+    def destinations(self):
+        return list(self._ranges)
+
+    def count(self, destination):
+        start, end = self._ranges.get(destination, (0, 0))
+        return end - start
+
+    def version(self, destination):
+        """Catalogs are read-only snapshots, so a destination's version never changes."""
+        return 0
+
+    def changes_since(self, destination, version):
+        """Nothing ever changes in a snapshot."""
+        return {} if version == 0 else None
+
+    def get(self, offer_id):
+        if not 0 <= offer_id < self._rows:
+            raise KeyError(f"Unknown offer id {offer_id}")
+        return self._record(offer_id)
+
+    def destination_of(self, offer_id):
+        for destination, (start, end) in self._ranges.items():
+            if start <= offer_id < end:
+                return destination
+        raise KeyError(f"Unknown offer id {offer_id}")
+
+    def cheapest(self, destination):
+        """Return the cheapest offer for a destination, or None if there are none."""
+        start, end = self._ranges.get(destination, (0, 0))
+        return self._record(start) if end > start else None
+
+    def top_k(self, destination, k):
+        """Return the k cheapest offers for a destination, cheapest first."""
+        start, end = self._ranges.get(destination, (0, 0))
+        return [self._record(row) for row in range(start, min(end, start + k))]
+
+    def offers(self, destination, max_price=None):
+        """Yield (offer id, record) pairs for a destination in price order, optionally capped."""
+        start, end = self._ranges.get(destination, (0, 0))
+        if max_price is not None:
+            end = bisect_right(self._prices, max_price, start, end)
+        for row in range(start, end):
+            yield row, self._record(row)
+
+    def _record(self, row):
+        record = {}
+        for field, kind in self._kinds.items():
+            column = self._columns[field]
+            if kind == "float":
+                record[field] = column[row]
+                continue
+            offsets, blob = column
+            text = str(blob[offsets[row]:offsets[row + 1]], "utf-8")
+            record[field] = (text.split(LIST_SEPARATOR) if text else []) if kind == "list" else text
+        return record
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a columnar offer catalog from a CSV or JSONL dump")
+    parser.add_argument("kind", choices=sorted(CATALOG_KINDS))
+    parser.add_argument("source", help="offer file (.csv or .jsonl), one offer per row with a destination")
+    parser.add_argument("directory", help="catalog directory to write")
+    args = parser.parse_args(argv)
+
+    columns, price_field = CATALOG_KINDS[args.kind]
+    rows = build_catalog(read_offer_records(args.source), args.directory, columns, price_field)
+    print(f"Wrote {rows} {args.kind} to {args.directory}")
+
+if __name__ == "__main__":
+    sys.exit(main())
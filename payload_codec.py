@@ -0,0 +1,230 @@
+import base64
+import contextvars
+import struct
+import zlib
+from uagents import Agent, Context, Model
+
+# Codec names exchanged during negotiation
+JSON_CODEC = "json"
+COMPACT_CODEC = "compact-v1"
+
+# Payloads whose binary encoding exceeds this many bytes are zlib-compressed
+DEFAULT_COMPRESSION_THRESHOLD = 1024
+
+_VERSION = 1
+_FLAG_COMPRESSED = 0x80
+
+# Value tags for the binary encoding
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _LIST, _DICT, _BYTES = range(9)
+
+class CodecOffer(Model):
+    codecs: list
+
+class CodecAccept(Model):
+    codec: str
+
+class CompactPayload(Model):
+    schema_digest: str
+    data: str  # base64 of the compact binary encoding
+
+# Codec agreed with each peer, keyed by (local address, peer address)
+_negotiated = {}
+
+# Set while a handler runs for a message that arrived as a CompactPayload, so replies match
+_compact_reply = contextvars.ContextVar("compact_reply", default=False)
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _read_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+def _write_value(out, value):
+    if value is None:
+        out.append(_NONE)
+    elif value is True:
+        out.append(_TRUE)
+    elif value is False:
+        out.append(_FALSE)
+    elif isinstance(value, int):
+        if not -(1 << 63) <= value < (1 << 63):
+            raise ValueError(f"Integer {value} does not fit in 64 bits")
+        out.append(_INT)
+        _write_varint(out, (value << 1) ^ (value >> 63))
+    elif isinstance(value, float):
+        out.append(_FLOAT)
+        out += struct.pack("<d", value)
+    elif isinstance(value, str):
+        encoded = value.encode("utf-8")
+        out.append(_STR)
+        _write_varint(out, len(encoded))
+        out += encoded
+    elif isinstance(value, (bytes, bytearray)):
+        out.append(_BYTES)
+        _write_varint(out, len(value))
+        out += value
+    elif isinstance(value, (list, tuple)):
+        out.append(_LIST)
+        _write_varint(out, len(value))
+        for item in value:
+            _write_value(out, item)
+    elif isinstance(value, dict):
+        out.append(_DICT)
+        _write_varint(out, len(value))
+        for key, item in value.items():
+            encoded = str(key).encode("utf-8")
+            _write_varint(out, len(encoded))
+            out += encoded
+            _write_value(out, item)
+    else:
+        raise TypeError(f"Cannot encode value of type {type(value).__name__}")
+
+def _read_value(data, pos):
+    tag = data[pos]
+    pos += 1
+    if tag == _NONE:
+        return None, pos
+    if tag == _TRUE:
+        return True, pos
+    if tag == _FALSE:
+        return False, pos
+    if tag == _INT:
+        raw, pos = _read_varint(data, pos)
+        return (raw >> 1) ^ -(raw & 1), pos
+    if tag == _FLOAT:
+        return struct.unpack_from("<d", data, pos)[0], pos + 8
+    if tag == _STR:
+        length, pos = _read_varint(data, pos)
+        return bytes(data[pos:pos + length]).decode("utf-8"), pos + length
+    if tag == _BYTES:
+        length, pos = _read_varint(data, pos)
+        return bytes(data[pos:pos + length]), pos + length
+    if tag == _LIST:
+        count, pos = _read_varint(data, pos)
+        items = []
+        for _ in range(count):
+            item, pos = _read_value(data, pos)
+            items.append(item)
+        return items, pos
+    if tag == _DICT:
+        count, pos = _read_varint(data, pos)
+        items = {}
+        for _ in range(count):
+            length, pos = _read_varint(data, pos)
+            key = bytes(data[pos:pos + length]).decode("utf-8")
+            items[key], pos = _read_value(data, pos + length)
+        return items, pos
+    raise ValueError(f"Unknown value tag {tag}")
+
+def encode_model(msg, compression_threshold=DEFAULT_COMPRESSION_THRESHOLD):
+    """Encode a Model to compact bytes: field values in declaration order, no field names.
+
+    The first byte holds the format version and a compressed flag; the body is
+    zlib-compressed when it is larger than compression_threshold bytes.
+    """
+    values = msg.dict()
+    body = bytearray()
+    _write_varint(body, len(values))
+    for name in type(msg).__fields__:
+        _write_value(body, values[name])
+    header = _VERSION
+    if compression_threshold is not None and len(body) > compression_threshold:
+        body = zlib.compress(bytes(body), 6)
+        header |= _FLAG_COMPRESSED
+    return bytes([header]) + bytes(body)
+
+def decode_model(data, model_cls):
+    """Decode bytes produced by encode_model back into an instance of model_cls."""
+    header = data[0]
+    if header & 0x7F != _VERSION:
+        raise ValueError(f"Unsupported compact payload version {header & 0x7F}")
+    body = memoryview(data)[1:]
+    if header & _FLAG_COMPRESSED:
+        body = memoryview(zlib.decompress(body))
+    count, pos = _read_varint(body, 0)
+    names = list(model_cls.__fields__)
+    if count != len(names):
+        raise ValueError(f"Payload has {count} fields, {model_cls.__name__} expects {len(names)}")
+    values = {}
+    for name in names:
+        values[name], pos = _read_value(body, pos)
+    return model_cls.parse_obj(values)
+
+def pack(msg, compression_threshold=DEFAULT_COMPRESSION_THRESHOLD):
+    """Wrap a Model in a CompactPayload message."""
+    return CompactPayload(
+        schema_digest=Model.build_schema_digest(msg),
+        data=base64.b64encode(encode_model(msg, compression_threshold)).decode("ascii"),
+    )
+
+def unpack(payload, model_cls):
+    """Unwrap a CompactPayload into model_cls, checking the schema digest matches."""
+    if payload.schema_digest != Model.build_schema_digest(model_cls):
+        raise ValueError(f"Compact payload does not carry a {model_cls.__name__}")
+    return decode_model(base64.b64decode(payload.data), model_cls)
+
+def enable_compact_payloads(agent: Agent, handlers):
+    """Let an agent accept compact payloads for the given {Model class: message handler} map.
+
+    The agent answers codec offers and unwraps incoming CompactPayload messages before
+    calling the regular handler; replies sent through reply() inside that handler go
+    back in the compact format too.
+    """
+    handlers_by_digest = {
+        Model.build_schema_digest(model_cls): (model_cls, handler) for model_cls, handler in handlers.items()
+    }
+
+    @agent.on_message(model=CodecOffer)
+    async def handle_codec_offer(ctx: Context, sender: str, msg: CodecOffer):
+        codec = COMPACT_CODEC if COMPACT_CODEC in msg.codecs else JSON_CODEC
+        _negotiated[(ctx.agent.address, sender)] = codec
+        await ctx.send(sender, CodecAccept(codec=codec))
+
+    @agent.on_message(model=CompactPayload)
+    async def handle_compact_payload(ctx: Context, sender: str, msg: CompactPayload):
+        if msg.schema_digest not in handlers_by_digest:
+            ctx.logger.error(f"No handler for compact payload with schema {msg.schema_digest}")
+            return
+        model_cls, handler = handlers_by_digest[msg.schema_digest]
+        token = _compact_reply.set(True)
+        try:
+            await handler(ctx, sender, unpack(msg, model_cls))
+        finally:
+            _compact_reply.reset(token)
+
+async def reply(ctx: Context, destination: str, msg: Model):
+    """Send a reply in the same format (JSON or compact) the request arrived in."""
+    if _compact_reply.get():
+        await ctx.send(destination, pack(msg))
+    else:
+        await ctx.send(destination, msg)
+
+async def negotiate(ctx: Context, destination: str):
+    """Agree on a codec with a peer once; peers that do not answer the offer get JSON."""
+    key = (ctx.agent.address, destination)
+    if key not in _negotiated:
+        accept, _ = await ctx.send_and_receive(
+            destination, CodecOffer(codecs=[COMPACT_CODEC, JSON_CODEC]), response_type=CodecAccept
+        )
+        _negotiated[key] = accept.codec if isinstance(accept, CodecAccept) else JSON_CODEC
+    return _negotiated[key]
+
+async def send_and_receive_compact(ctx: Context, destination: str, msg: Model, response_type):
+    """Drop-in for ctx.send_and_receive that uses the compact codec when the peer supports it."""
+    if await negotiate(ctx, destination) != COMPACT_CODEC:
+        return await ctx.send_and_receive(destination, msg, response_type=response_type)
+    payload, status = await ctx.send_and_receive(destination, pack(msg), response_type=CompactPayload)
+    if not isinstance(payload, CompactPayload):
+        return payload, status
+    return unpack(payload, response_type), status
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 from uagents import Agent, Context, Model
+from payload_codec import enable_compact_payloads, reply
 
 class PhotoSpotsRequest(Model):
     destination: str
@@ -27,7 +28,10 @@ async def handle_photo_spots_request(ctx: Context, sender: str, msg: PhotoSpotsR
     
     # Create and send the response
     response = PhotoSpotsResponse(spots=photo_spots)
-    await ctx.send(sender, response)
+    await reply(ctx, sender, response)
+
+# Accept PhotoSpotsRequest as a compact payload from peers that negotiate it
+enable_compact_payloads(photo_spots_agent, {PhotoSpotsRequest: handle_photo_spots_request})
 
 def get_photo_spots(destination):
     """Get photo spots for a given destination."""
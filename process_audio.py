@@ -1,29 +1,66 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+import aiohttp
+import asyncio
+import hashlib
+import json
+import logging
 import os
+import uvicorn
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from deepgram import DeepgramClient, PrerecordedOptions
+from deepgram import AnalyzeOptions, DeepgramClient, PrerecordedOptions
 import google.generativeai as genai
-from waitress import serve
-from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-# Comment out RAG import for now
-# from rag.engine import RAGEngine
-
-app = Flask(__name__)
-CORS(app, resources={
-    r"/*": {
-        "origins": ["http://localhost:3000"],  # Add your frontend URL
-        "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
-    }
-})
+from rag.engine import RAGEngine
+from streaming_stt import make_streaming_backend
+from transcript_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_ENTRIES, TranscriptCache
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Clients and caches shared by every route, set up once per process
+    global http_session, rag_engine
+    http_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=AUDIO_FETCH_TIMEOUT))
+    try:
+        rag_engine = RAGEngine()
+    except Exception:
+        logger.exception("RAG engine unavailable, /voice/query and /text/query will answer 503")
+    yield
+    await http_session.close()
+    transcript_cache.close()
+    if rag_engine is not None:
+        rag_engine.close()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["http://localhost:3000"],  # Add your frontend URL
+    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_headers=["Content-Type", "Authorization"],
+)
 
 # Load environment variables
 load_dotenv()
 DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
 GOOGLE_API_KEY = os.getenv("GEMINI_API_KEY")
 
+# Calls in flight to each upstream, and how long one may take, queueing included (seconds)
+DEEPGRAM_CONCURRENCY = int(os.getenv("DEEPGRAM_CONCURRENCY", "64"))
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "32"))
+DEEPGRAM_TIMEOUT = float(os.getenv("DEEPGRAM_TIMEOUT", "30"))
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30"))
+
+# Audio clips are fetched (and hashed) here before transcription
+AUDIO_FETCH_TIMEOUT = float(os.getenv("AUDIO_FETCH_TIMEOUT", "30"))
+MAX_AUDIO_BYTES = int(os.getenv("MAX_AUDIO_BYTES", str(50 * 1024 * 1024)))
+
+# Live transcription streams open at once, and the audio options a client may set for one
+STT_MAX_STREAMS = int(os.getenv("STT_MAX_STREAMS", "200"))
+STREAM_OPTIONS = {"encoding": str, "sample_rate": int, "channels": int, "language": str}
+
 # Configure clients
 dg_client = DeepgramClient(api_key=DEEPGRAM_API_KEY)
 genai.configure(api_key=GOOGLE_API_KEY)
@@ -31,62 +68,211 @@ genai.configure(api_key=GOOGLE_API_KEY)
 #     print(model.name, "-", model.supported_generation_methods)
 model = genai.GenerativeModel(("gemini-1.0-pro") )
 
-# Comment out RAG initialization
-# rag_engine = RAGEngine()
+deepgram_slots = asyncio.Semaphore(DEEPGRAM_CONCURRENCY)
+gemini_slots = asyncio.Semaphore(GEMINI_CONCURRENCY)
+http_session = None
+
+# Streaming speech-to-text, picked by STT_BACKEND ("deepgram" or the offline "local")
+stt_backend = make_streaming_backend(deepgram_client=dg_client)
+stream_slots = asyncio.Semaphore(STT_MAX_STREAMS)
+
+# Transcripts of clips already seen, by audio URL and content hash
+transcript_cache = TranscriptCache(
+    os.getenv("TRANSCRIPT_CACHE_PATH", DEFAULT_CACHE_PATH),
+    int(os.getenv("TRANSCRIPT_CACHE_SIZE", DEFAULT_MAX_ENTRIES)),
+)
+# Transcriptions in flight, so concurrent retries of one clip share a single call
+pending_transcriptions = {}
+
+# Built at startup; answers /voice/query and /text/query
+rag_engine = None
 
 class AudioRequest(BaseModel):
     audio_url: str
     user_id: str
+    user_context: dict = {}
 
 class QueryRequest(BaseModel):
     question: str
     user_id: str
+    user_context: dict = {}
+
+class TranscriptRequest(BaseModel):
+    transcript: str = ""
+
+class AudioUrlRequest(BaseModel):
+    audio_url: str = ""
+
+class RealTimeTranscriptRequest(BaseModel):
+    audioTranscript: str = ""
+
+async def call_upstream(slots, timeout, call):
+    """Await call() once a slot is free; asyncio.TimeoutError if waiting and calling exceed timeout."""
+    async def run():
+        async with slots:
+            return await call()
+    return await asyncio.wait_for(run(), timeout)
+
+async def fetch_audio(audio_url):
+    """Download a clip; returns (audio bytes, sha256 hex digest)."""
+    digest = hashlib.sha256()
+    audio = bytearray()
+    async with http_session.get(audio_url) as response:
+        response.raise_for_status()
+        async for block in response.content.iter_chunked(64 * 1024):
+            audio += block
+            if len(audio) > MAX_AUDIO_BYTES:
+                raise ValueError(f"Audio is larger than {MAX_AUDIO_BYTES} bytes")
+            digest.update(block)
+    return bytes(audio), digest.hexdigest()
+
+async def transcribe(audio, analyze=True):
+    """Prerecorded Deepgram transcription, with sentiment and topic analysis unless analyze is False, as a dict."""
+    options = PrerecordedOptions(
+        model="nova",
+        smart_format=True,
+        utterances=True,
+        detect_language=True,
+        sentiment=analyze,
+        topics=analyze,
+    )
+    source = {"buffer": audio}
+    response = await call_upstream(
+        deepgram_slots, DEEPGRAM_TIMEOUT,
+        lambda: dg_client.listen.asyncprerecorded.v("1").transcribe_file(source, options),
+    )
+    return response.to_dict() if hasattr(response, "to_dict") else response
+
+async def analyze_audio(audio_url):
+    """Return ({"transcript", "sentiment", "topics"}, served from cache) for the clip at audio_url.
+
+    The clip is always fetched so its content hash can be checked, but a clip seen
+    before is not transcribed again.
+    """
+    audio, content_hash = await fetch_audio(audio_url)
+    cached = transcript_cache.get(audio_url, content_hash)
+    if cached is not None:
+        return cached, True
 
-@app.route('/agent-response', methods=['POST'])
-def agent_response():
-    data = request.json
-    user_transcript = data.get('transcript', '')
+    pending = pending_transcriptions.get((audio_url, content_hash))
+    if pending is not None:
+        return await asyncio.shield(pending), True
+
+    async def run():
+        transcript, sentiment, topics = analysis_of(await transcribe(audio))
+        transcript_cache.put(audio_url, content_hash, transcript, sentiment, topics)
+        return {"transcript": transcript, "sentiment": sentiment, "topics": topics}
+
+    return await asyncio.shield(share_transcription(audio_url, content_hash, run)), False
+
+def share_transcription(audio_url, content_hash, run):
+    """Start run() as the clip's in-flight transcription; other requests for the clip await it.
+
+    run() returns {"transcript", "sentiment", "topics"} and caches it, and keeps going
+    even if the request that started it goes away.
+    """
+    key = (audio_url, content_hash)
+
+    def done(task):
+        pending_transcriptions.pop(key, None)
+        # A failure is reported by the requests awaiting it, which may all be gone by now
+        if not task.cancelled():
+            task.exception()
+
+    pending = pending_transcriptions[key] = asyncio.ensure_future(run())
+    pending.add_done_callback(done)
+    return pending
+
+def sentiment_and_topics(results):
+    """Return (average sentiment or None, distinct topics) from Deepgram audio or text intelligence results."""
+    sentiment = (results.get('sentiments') or {}).get('average', {}).get('sentiment')
+    topics = []
+    for segment in (results.get('topics') or {}).get('segments', []):
+        for topic in segment.get('topics', []):
+            if topic['topic'] not in topics:
+                topics.append(topic['topic'])
+    return sentiment, topics
+
+def analysis_of(result):
+    """Return (transcript, sentiment, topics) from a Deepgram prerecorded result."""
+    results = result['results']
+    transcript = results['channels'][0]['alternatives'][0]['transcript']
+    utterance_data = results.get('utterances') or []
+    sentiment, topics = sentiment_and_topics(results)
+    if sentiment is None:
+        sentiment = utterance_data[0].get('sentiment', 'neutral') if utterance_data else 'neutral'
+    if not topics and utterance_data:
+        topics = utterance_data[0].get('topics', [])
+    return transcript, sentiment, topics
+
+async def analyze_text(transcript):
+    """Sentiment and topics of a transcript from Deepgram text intelligence; returns (sentiment, topics)."""
+    options = AnalyzeOptions(language="en", sentiment=True, topics=True)
+    response = await call_upstream(
+        deepgram_slots, DEEPGRAM_TIMEOUT,
+        lambda: dg_client.read.asyncanalyze.v("1").analyze_text({"buffer": transcript}, options),
+    )
+    result = response.to_dict() if hasattr(response, "to_dict") else response
+    sentiment, topics = sentiment_and_topics(result['results'])
+    return sentiment or 'neutral', topics
+
+async def generate(prompt):
+    response = await call_upstream(gemini_slots, GEMINI_TIMEOUT, lambda: model.generate_content_async(prompt))
+    return response.text.strip()
+
+async def generate_stream(prompt):
+    """Yield Gemini's reply in pieces as they are generated, within GEMINI_TIMEOUT overall."""
+    pieces = asyncio.Queue()
+
+    async def produce():
+        response = await model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            if chunk.text:
+                pieces.put_nowait(chunk.text)
+
+    # The slot is held by call_upstream, so it is released however the stream ends
+    producing = asyncio.ensure_future(call_upstream(gemini_slots, GEMINI_TIMEOUT, produce))
+    producing.add_done_callback(lambda _: pieces.put_nowait(None))
+    try:
+        while (piece := await pieces.get()) is not None:
+            yield piece
+        await producing
+    finally:
+        producing.cancel()
+
+def ndjson(event):
+    return json.dumps(event) + "\n"
+
+@app.post('/agent-response')
+async def agent_response(data: TranscriptRequest):
+    user_transcript = data.transcript
 
     if not user_transcript:
-        return jsonify({'response': "Sorry, I didn't catch that."})
+        return {'response': "Sorry, I didn't catch that."}
 
     prompt = f"You are a helpful travel assistant. The user said: '{user_transcript}'. Respond accordingly."
 
     try:
-        response = model.generate_content(prompt)
-        return jsonify({
-    'transcript': user_transcript,
-    'response': response.text.strip()
-})
+        return {
+            'transcript': user_transcript,
+            'response': await generate(prompt)
+        }
+    except asyncio.TimeoutError:
+        return {'response': "Error processing request: the assistant timed out"}
     except Exception as e:
-        return jsonify({'response': f"Error processing request: {str(e)}"})
+        return {'response': f"Error processing request: {str(e)}"}
 
 
-@app.route('/agent-response_audio', methods=['POST'])
-def analyze_and_respond():
-    data = request.json
-    audio_url = data.get('audio_url')  # Ensure your frontend sends this
+@app.post('/agent-response_audio')
+async def analyze_and_respond(data: AudioUrlRequest):
+    audio_url = data.audio_url  # Ensure your frontend sends this
 
     if not audio_url:
-        return jsonify({'error': 'Audio URL is missing'}), 400
+        return JSONResponse({'error': 'Audio URL is missing'}, status_code=400)
 
     try:
-        options = PrerecordedOptions(
-            model="nova",
-            smart_format=True,
-            utterances=True,
-            detect_language=True,
-            analyze="sentiment,topics"
-        )
-
-        source = {"url": audio_url}
-        response = dg_client.listen.prerecorded.v("1").transcribe_dict(source=source, options=options)
-
-        # Extract data
-        transcript = response['results']['channels'][0]['alternatives'][0]['transcript']
-        utterance_data = response['results'].get('utterances', [])
-        sentiment = utterance_data[0].get('sentiment', 'neutral') if utterance_data else 'neutral'
-        topics = utterance_data[0].get('topics', []) if utterance_data else []
+        analysis, cached = await analyze_audio(audio_url)
+        transcript, sentiment, topics = analysis["transcript"], analysis["sentiment"], analysis["topics"]
 
         # Gemini prompt
         prompt = (
@@ -95,69 +281,245 @@ def analyze_and_respond():
             f"Respond helpfully and empathetically."
         )
 
-        gemini_response = model.generate_content(prompt)
-        return jsonify({
+        return {
             'transcript': transcript,
             'sentiment': sentiment,
             'topics': topics,
-            'response': gemini_response.text.strip()
-        })
+            'cached': cached,
+            'response': await generate(prompt)
+        }
+
+    except asyncio.TimeoutError:
+        return JSONResponse({'error': 'Upstream request timed out'}, status_code=504)
+    except aiohttp.ClientError as e:
+        return JSONResponse({'error': f"Could not fetch audio: {e}"}, status_code=502)
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
 
+@app.post('/agent-response_audio/stream')
+async def analyze_and_respond_stream(data: AudioUrlRequest):
+    """Pipelined /agent-response_audio, streamed as newline-delimited JSON events.
+
+    Audio is transcribed without analysis, and Gemini starts on the transcript right
+    away. Sentiment and topics come from a text analysis running alongside the reply.
+    A clip that another request is already transcribing is not transcribed again.
+    Events: "transcript", then "token" pieces of the reply with one "analysis" among
+    them, then "done" with the full reply (or "error").
+    """
+    audio_url = data.audio_url
+
+    if not audio_url:
+        return JSONResponse({'error': 'Audio URL is missing'}, status_code=400)
+
+    try:
+        audio, content_hash = await fetch_audio(audio_url)
+        cached = transcript_cache.get(audio_url, content_hash)
+        pending = None
+        if cached is None:
+            pending = pending_transcriptions.get((audio_url, content_hash))
+            if pending is not None:
+                # Another request is already transcribing this clip: share its result
+                cached = await asyncio.shield(pending)
+        if cached is not None:
+            transcript = cached['transcript']
+        else:
+            transcribing = asyncio.ensure_future(transcribe(audio, analyze=False))
+
+            async def run():
+                transcript = analysis_of(await transcribing)[0]
+                sentiment, topics = await analyze_text(transcript)
+                transcript_cache.put(audio_url, content_hash, transcript, sentiment, topics)
+                return {"transcript": transcript, "sentiment": sentiment, "topics": topics}
+
+            pending = share_transcription(audio_url, content_hash, run)
+            transcript = analysis_of(await asyncio.shield(transcribing))[0]
+    except asyncio.TimeoutError:
+        return JSONResponse({'error': 'Upstream request timed out'}, status_code=504)
+    except aiohttp.ClientError as e:
+        return JSONResponse({'error': f"Could not fetch audio: {e}"}, status_code=502)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
-    
-@app.route('/transcribe-real', methods=['POST'])
-def transcribe_audio_real_time():
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+    async def analyze():
+        try:
+            result = cached if cached is not None else await asyncio.shield(pending)
+        except asyncio.TimeoutError:
+            return {'type': 'analysis', 'error': 'Upstream request timed out'}
+        except Exception as e:
+            return {'type': 'analysis', 'error': str(e)}
+        return {'type': 'analysis', 'sentiment': result['sentiment'], 'topics': result['topics']}
+
+    analysis = asyncio.ensure_future(analyze())
+
+    async def events():
+        yield ndjson({'type': 'transcript', 'transcript': transcript, 'cached': cached is not None})
+        prompt = (
+            f"You are a helpful travel assistant. The user said: '{transcript}'. "
+            f"Respond helpfully and empathetically."
+        )
+        reply = []
+        analysis_sent = False
+        try:
+            async for text in generate_stream(prompt):
+                reply.append(text)
+                yield ndjson({'type': 'token', 'text': text})
+                if not analysis_sent and analysis.done():
+                    analysis_sent = True
+                    yield ndjson(analysis.result())
+            if not analysis_sent:
+                yield ndjson(await asyncio.shield(analysis))
+            yield ndjson({'type': 'done', 'response': "".join(reply).strip()})
+        except asyncio.TimeoutError:
+            yield ndjson({'type': 'error', 'error': 'Upstream request timed out'})
+        except Exception as e:
+            yield ndjson({'type': 'error', 'error': str(e)})
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.get('/metrics/transcript-cache')
+async def transcript_cache_metrics():
+    return transcript_cache.stats()
+
+@app.post('/transcribe-real')
+async def transcribe_audio_real_time(data: RealTimeTranscriptRequest):
     try:
-        data = request.json
-        audio_transcript = data.get('audioTranscript')
+        audio_transcript = data.audioTranscript
 
         if not audio_transcript:
-            return jsonify({'error': 'Transcript is missing'}), 400
+            return JSONResponse({'error': 'Transcript is missing'}, status_code=400)
 
         # Add debug logging
         print(f"Received transcript: {audio_transcript}")
-        
-        return jsonify({'transcript': audio_transcript})
+
+        return {'transcript': audio_transcript}
 
     except Exception as e:
         print(f"Error in transcribe_audio_real_time: {str(e)}")  # Debug logging
-        return jsonify({'error': str(e)}), 500
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+async def forward_transcripts(websocket, stream):
+    # Relay transcript events to the client until the backend is done
+    async for event in stream.events():
+        await websocket.send_json(event)
+    await websocket.send_json({"type": "done"})
+
+@app.websocket('/ws/transcribe')
+async def transcribe_stream(websocket: WebSocket):
+    """Live transcription: binary frames carry audio, a {"type": "stop"} text frame ends it.
+
+    Interim and final transcripts are sent back as JSON as soon as the backend produces
+    them, then {"type": "done"}. Query parameters encoding, sample_rate, channels and
+    language describe the audio.
+    """
+    await websocket.accept()
+    if stream_slots.locked():
+        await websocket.close(code=1013, reason="Too many live transcriptions")
+        return
+
+    async with stream_slots:
+        try:
+            options = {
+                name: convert(websocket.query_params[name])
+                for name, convert in STREAM_OPTIONS.items() if name in websocket.query_params
+            }
+            stream = await asyncio.wait_for(stt_backend.open(**options), DEEPGRAM_TIMEOUT)
+        except Exception as e:
+            await websocket.send_json({"type": "error", "error": str(e)})
+            await websocket.close(code=1011)
+            return
+
+        forwarding = asyncio.ensure_future(forward_transcripts(websocket, stream))
+        connected = True
+        try:
+            try:
+                while True:
+                    message = await websocket.receive()
+                    if message["type"] == "websocket.disconnect":
+                        connected = False
+                        break
+                    if message.get("bytes") is not None:
+                        await stream.send(message["bytes"])
+                    elif message.get("text"):
+                        try:
+                            control = json.loads(message["text"])
+                        except ValueError:
+                            continue
+                        if isinstance(control, dict) and control.get("type") == "stop":
+                            break
+            finally:
+                await stream.finish()
+        except Exception as e:
+            # The backend failed mid-stream: stop relaying, report it and close as a server error
+            forwarding.cancel()
+            if connected:
+                try:
+                    await websocket.send_json({"type": "error", "error": str(e)})
+                    await websocket.close(code=1011)
+                except (WebSocketDisconnect, RuntimeError):
+                    pass
+        else:
+            try:
+                await forwarding
+            except (WebSocketDisconnect, RuntimeError):
+                connected = False
+            if connected:
+                await websocket.close()
+        finally:
+            forwarding.cancel()
+            await asyncio.gather(forwarding, return_exceptions=True)
+
+async def transcribe_audio(audio_url):
+    """Transcript of the clip at audio_url, from the transcript cache when it was seen before."""
+    analysis, _ = await analyze_audio(audio_url)
+    return analysis["transcript"]
+
+def get_user_context(request):
+    # The profile the client sent with the request; the RAG engine keeps only what is relevant
+    return {**request.user_context, "user_id": request.user_id}
+
+async def rag_answer(question, request):
+    if rag_engine is None:
+        raise HTTPException(status_code=503, detail="RAG engine is not available")
+    return await rag_engine.query(question, get_user_context(request))
 
 @app.post("/voice/query")
 async def process_voice_query(request: AudioRequest):
     try:
-        # Transcribe audio
         transcript = await transcribe_audio(request.audio_url)
-        
-        # Get user context
-        # user_context = await get_user_context(request.user_id)
-        
-        # Get response using RAG
-        # response = await rag_engine.query(transcript, user_context)
-        
         return {
             "transcript": transcript,
-            "response": "RAG functionality temporarily disabled"
+            "response": await rag_answer(transcript, request)
         }
+    except HTTPException:
+        raise
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Upstream request timed out")
+    except aiohttp.ClientError as e:
+        raise HTTPException(status_code=502, detail=f"Could not fetch audio: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/text/query")
 async def process_text_query(request: QueryRequest):
     try:
-        # Get user context
-        # user_context = await get_user_context(request.user_id)
-        
-        # Get response using RAG
-        # response = await rag_engine.query(request.question, user_context)
-        
         return {
-            "response": "RAG functionality temporarily disabled"
+            "response": await rag_answer(request.question, request)
         }
+    except HTTPException:
+        raise
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Upstream request timed out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get('/metrics/rag')
+async def rag_metrics():
+    if rag_engine is None:
+        raise HTTPException(status_code=503, detail="RAG engine is not available")
+    return rag_engine.cache_stats()
+
 if __name__ == "__main__":
-    print("Starting server on port 8002...")  # Debug logging
-    serve(app, host="0.0.0.0", port=8002) 
+    port = int(os.getenv("PORT", "8002"))
+    print(f"Starting server on port {port}...")  # Debug logging
+    # One event loop serves every route; the semaphores above bound the upstream load
+    uvicorn.run(app, host="0.0.0.0", port=port)
@@ -0,0 +1,48 @@
+from collections import OrderedDict
+
+# Most quotes kept before the least recently used one is dropped
+DEFAULT_MAX_ENTRIES = 1024
+
+class QuoteCache:
+    """LRU cache of quotes, each stored with the inventory version stamp it was built from.
+
+    A lookup only returns a quote if the caller's current stamp equals the stored one, so
+    any change to the inventory behind a quote makes it miss instead of going stale.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, stamp):
+        """Return the quote cached for key if it was built from the same stamp, else None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] != stamp:
+            del self._entries[key]
+            self.stale += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, stamp, quote):
+        self._entries[key] = (stamp, quote)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "stale": self.stale}
@@ -0,0 +1,131 @@
+import time
+from collections import OrderedDict
+import numpy as np
+
+class TTLCache:
+    """LRU cache whose entries also expire ttl seconds after they were stored."""
+
+    def __init__(self, max_entries=512, ttl=600.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= self._clock():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, value):
+        self._entries[key] = (self._clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+class SemanticCache:
+    """Answers to earlier questions, looked up by embedding similarity.
+
+    Question vectors are kept unit-length in one preallocated matrix, so a lookup is a
+    single matrix-vector product over the live entries. An answer is reused when the
+    best match under the same context key reaches threshold (cosine similarity).
+    Entries expire after ttl seconds; when full the least recently used one is replaced.
+    """
+
+    # Width of the similarity histogram buckets reported by stats()
+    HISTOGRAM_STEP = 0.05
+
+    def __init__(self, threshold=0.92, max_entries=2048, ttl=3600.0, clock=time.monotonic):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        # Allocated on the first store, once the embedding width is known
+        self._vectors = None
+        self._expires = np.full(max_entries, -np.inf)
+        self._last_used = np.zeros(max_entries)
+        self._contexts = [None] * max_entries
+        self._answers = [None] * max_entries
+        self.hits = 0
+        self.misses = 0
+        self._histogram = [0] * (int(round(1 / self.HISTOGRAM_STEP)) + 1)
+
+    def __len__(self):
+        return int(np.count_nonzero(self._expires > self._clock()))
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, vector, context):
+        """Return (answer, similarity) for the closest live entry with the same context.
+
+        answer is None when nothing reaches the threshold; similarity is the best one
+        seen either way (None if there was nothing to compare with).
+        """
+        now = self._clock()
+        live = (self._expires > now) & np.array([c == context for c in self._contexts])
+        if self._vectors is None or not live.any():
+            self.misses += 1
+            return None, None
+        similarities = self._vectors @ self._unit(vector)
+        similarities[~live] = -np.inf
+        slot = int(np.argmax(similarities))
+        similarity = float(similarities[slot])
+        self._histogram[int(max(similarity, 0.0) / self.HISTOGRAM_STEP)] += 1
+        if similarity < self.threshold:
+            self.misses += 1
+            return None, similarity
+        self.hits += 1
+        self._last_used[slot] = now
+        return self._answers[slot], similarity
+
+    def store(self, vector, context, answer):
+        now = self._clock()
+        expired = np.flatnonzero(self._expires <= now)
+        slot = int(expired[0]) if len(expired) else int(np.argmin(self._last_used))
+        vector = self._unit(vector)
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+        self._vectors[slot] = vector
+        self._expires[slot] = now + self.ttl
+        self._last_used[slot] = now
+        self._contexts[slot] = context
+        self._answers[slot] = answer
+
+    def clear(self):
+        self._expires[:] = -np.inf
+        self._contexts = [None] * self.max_entries
+        self._answers = [None] * self.max_entries
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "threshold": self.threshold,
+            # Best-match similarity per lookup, bucketed: {bucket lower bound: lookups}
+            "similarity_histogram": {
+                round(i * self.HISTOGRAM_STEP, 2): count for i, count in enumerate(self._histogram) if count
+            },
+        }
@@ -0,0 +1,113 @@
+import math
+from collections import OrderedDict
+from keyword_index import terms
+from rag.retrieval import detect_topic
+
+DEFAULT_TOKEN_BUDGET = 120
+DEFAULT_MAX_USERS = 10000
+
+# Rendering limits for a single profile field
+MAX_LIST_ITEMS = 5
+MAX_VALUE_CHARS = 120
+
+# Fields worth including whatever the question is
+CORE_FIELDS = frozenset({"destination", "start_date", "end_date", "travel_dates", "travelers"})
+
+# Question topic (see rag.retrieval.detect_topic) -> words in field names that serve it
+FIELD_TOPICS = {
+    "food": ("diet", "dietary", "allerg", "cuisine", "food"),
+    "budget": ("budget", "currency", "spend"),
+    "accommodation": ("hotel", "accommodation", "lodging", "room"),
+    "transport": ("transport", "mobility", "car", "airline", "airport"),
+    "activities": ("interest", "activit", "hobb"),
+    "events": ("interest",),
+    "safety": ("medical", "health", "insurance", "mobility"),
+    "weather": ("clothing",),
+}
+
+# Fields that identify the user rather than describe the trip
+IGNORED_FIELDS = frozenset({"user_id", "email", "name", "phone"})
+
+def count_tokens(text):
+    """Approximate LLM tokens in text (about four characters per token)."""
+    return math.ceil(len(text) / 4)
+
+def render_value(value):
+    if isinstance(value, dict):
+        value = "; ".join(f"{key}={render_value(item)}" for key, item in value.items())
+    elif isinstance(value, (list, tuple, set)):
+        items = [render_value(item) for item in value]
+        extra = len(items) - MAX_LIST_ITEMS
+        value = ", ".join(items[:MAX_LIST_ITEMS]) + (f" (+{extra} more)" if extra > 0 else "")
+    else:
+        value = str(value)
+    return value if len(value) <= MAX_VALUE_CHARS else value[:MAX_VALUE_CHARS - 3] + "..."
+
+class _Field:
+    __slots__ = ("value", "line", "tokens", "terms")
+
+    def __init__(self, key, value):
+        self.value = value
+        self.line = f"{key}: {render_value(value)}"
+        self.tokens = count_tokens(self.line) + 1
+        self.terms = terms(self.line.replace("_", " "))
+
+class UserContextBuilder:
+    """Compact, question-aware rendering of user profiles for RAG prompts.
+
+    Each user's profile is kept pre-rendered one field per line, and update() only
+    re-renders the fields whose values changed. build() scores fields against the
+    question (core trip fields, fields serving the question's topic, shared terms) and
+    packs the best ones into a token budget.
+    """
+
+    def __init__(self, token_budget=DEFAULT_TOKEN_BUDGET, max_users=DEFAULT_MAX_USERS):
+        self.token_budget = token_budget
+        self.max_users = max_users
+        self._profiles = OrderedDict()
+
+    def update(self, user_id, profile):
+        """Bring the cached summary for user_id in line with profile; returns its fields."""
+        fields = self._profiles.get(user_id, {})
+        current = {}
+        for key, value in profile.items():
+            if key in IGNORED_FIELDS or value in (None, "", [], {}):
+                continue
+            cached = fields.get(key)
+            current[key] = cached if cached is not None and cached.value == value else _Field(key, value)
+        if user_id is not None:
+            self._profiles[user_id] = current
+            self._profiles.move_to_end(user_id)
+            while len(self._profiles) > self.max_users:
+                self._profiles.popitem(last=False)
+        return current
+
+    def forget(self, user_id):
+        self._profiles.pop(user_id, None)
+
+    def build(self, profile, question, user_id=None):
+        """Return (context text, its token count) with the fields most relevant to question."""
+        fields = self.update(user_id if user_id is not None else profile.get("user_id"), profile)
+        question_terms = terms(question)
+        topic_words = FIELD_TOPICS.get(detect_topic(question), ())
+
+        scored = []
+        for position, (key, field) in enumerate(fields.items()):
+            score = len(question_terms & field.terms)
+            if key in CORE_FIELDS:
+                score += 3
+            if any(word in key.lower() for word in topic_words):
+                score += 2
+            if score:
+                scored.append((-score, position, key, field))
+        scored.sort()
+
+        chosen = []
+        used = 0
+        for _, position, key, field in scored:
+            if used + field.tokens <= self.token_budget:
+                chosen.append((position, field.line))
+                used += field.tokens
+        chosen.sort()
+        text = "\n".join(line for _, line in chosen)
+        return text, count_tokens(text)
@@ -0,0 +1,149 @@
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from langchain.embeddings.base import Embeddings
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "embedding_cache.sqlite3")
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_MAX_CONCURRENCY = 4
+
+# Cache lookups per SQL statement (SQLite limits bound parameters)
+_LOOKUP_CHUNK = 500
+
+_TOKEN = re.compile(r"\w+")
+
+class HashEmbeddings(Embeddings):
+    """Deterministic local embeddings from hashed word and word-pair features.
+
+    No network and no model: texts sharing words get similar vectors, which is enough
+    for offline runs, tests and benchmarking ingestion.
+    """
+
+    def __init__(self, dimensions=256):
+        self.dimensions = dimensions
+        self.model_name = f"hash-{dimensions}"
+
+    def _embed(self, text):
+        vector = [0.0] * self.dimensions
+        words = _TOKEN.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper with an on-disk cache keyed by content hash.
+
+    Texts already embedded by the same backend (including duplicates inside one call)
+    are served from a SQLite cache. The rest are sent to the backend in batches of
+    batch_size, with up to max_concurrency batches in flight at once.
+    """
+
+    def __init__(self, backend, cache_path=DEFAULT_CACHE_PATH, batch_size=DEFAULT_BATCH_SIZE,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY, namespace=None):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        # Vectors from different models must never be mixed up
+        self.namespace = namespace or getattr(backend, "model", None) or getattr(backend, "model_name", None) \
+            or type(backend).__name__
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(cache_path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._db.commit()
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.namespace}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys):
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_CHUNK):
+                chunk = keys[start:start + _LOOKUP_CHUNK]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                )
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+        return found
+
+    def _store(self, vectors):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, array("f", vector).tobytes()) for key, vector in vectors.items()],
+            )
+            self._db.commit()
+
+    def embed_documents(self, texts):
+        keys = [self._key(text) for text in texts]
+        vectors = self._lookup(list(set(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            missing_keys = list(missing)
+            batches = [missing_keys[start:start + self.batch_size]
+                       for start in range(0, len(missing_keys), self.batch_size)]
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as pool:
+                results = pool.map(lambda batch: self.backend.embed_documents([missing[key] for key in batch]), batches)
+                for batch, embedded in zip(batches, results):
+                    new_vectors = dict(zip(batch, embedded))
+                    self._store(new_vectors)
+                    vectors.update(new_vectors)
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+def make_embeddings(backend=None, cache_path=None, batch_size=None, max_concurrency=None):
+    """Build the cached embedding layer for RAGEngine.
+
+    backend is "openai" or "hash" (default: the RAG_EMBEDDINGS env var, else "openai");
+    the cache file, batch size and concurrency also fall back to RAG_EMBEDDING_CACHE,
+    RAG_EMBEDDING_BATCH_SIZE and RAG_EMBEDDING_CONCURRENCY.
+    """
+    backend = backend or os.getenv("RAG_EMBEDDINGS", "openai")
+    if backend == "hash":
+        model = HashEmbeddings()
+    elif backend == "openai":
+        from langchain.embeddings import OpenAIEmbeddings
+        model = OpenAIEmbeddings()
+    else:
+        raise ValueError(f"Unknown embeddings backend {backend!r}")
+    return CachedEmbeddings(
+        model,
+        cache_path=cache_path or os.getenv("RAG_EMBEDDING_CACHE", DEFAULT_CACHE_PATH),
+        batch_size=batch_size or int(os.getenv("RAG_EMBEDDING_BATCH_SIZE", DEFAULT_BATCH_SIZE)),
+        max_concurrency=max_concurrency or int(os.getenv("RAG_EMBEDDING_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)),
+    )
@@ -1,33 +1,254 @@
-from langchain.embeddings import OpenAIEmbeddings
 from langchain.vectorstores import Chroma
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.chains import RetrievalQA
 from langchain.llms import OpenAI
+from langchain.callbacks.base import BaseCallbackHandler
+import asyncio
+import functools
+import logging
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from rag.cache import SemanticCache, TTLCache
+from rag.context import DEFAULT_TOKEN_BUDGET, UserContextBuilder, count_tokens
+from rag.embeddings import make_embeddings
+from rag.retrieval import BM25Index, HybridRetriever, chunk_id, query_destination, tag_chunk
+
+# Where the vector store lives on disk, and the collection the travel corpus is kept in
+DEFAULT_PERSIST_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vector_store")
+DEFAULT_COLLECTION = "travel_documents"
+
+# Chunks written to the collection per add call
+ADD_BATCH_SIZE = 500
+
+# Queries answered at once, and how long one may take before it is abandoned (seconds)
+DEFAULT_QUERY_CONCURRENCY = int(os.getenv("RAG_QUERY_CONCURRENCY", "4"))
+DEFAULT_QUERY_TIMEOUT = float(os.getenv("RAG_QUERY_TIMEOUT", "30"))
+
+# Answers kept for repeat questions, and for how long (seconds)
+DEFAULT_RESULT_CACHE_SIZE = 512
+DEFAULT_RESULT_CACHE_TTL = float(os.getenv("RAG_RESULT_CACHE_TTL", "600"))
+
+# Paraphrased questions whose embeddings are at least this similar share an answer
+DEFAULT_SEMANTIC_THRESHOLD = float(os.getenv("RAG_SEMANTIC_THRESHOLD", "0.92"))
+DEFAULT_SEMANTIC_CACHE_SIZE = 2048
+DEFAULT_SEMANTIC_CACHE_TTL = float(os.getenv("RAG_SEMANTIC_CACHE_TTL", "3600"))
+
+# Most prompt tokens spent on user context per query
+CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET))
+
+logger = logging.getLogger(__name__)
+
+# User context keys that change from request to request without changing the answer
+VOLATILE_CONTEXT_KEYS = frozenset({"timestamp", "request_id", "session_id", "last_active", "updated_at"})
+
+class PromptRecorder(BaseCallbackHandler):
+    """Passes each prompt the chain sends to the LLM, retrieved chunks and all, to record()."""
+
+    def __init__(self, record):
+        self.record = record
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        for prompt in prompts:
+            self.record(prompt)
+
+def normalize_question(question):
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", question.strip().lower()).rstrip(" ?!.")
+
+def relevant_context(user_context, keys=None):
+    """The parts of a user context that can change an answer."""
+    return {
+        key: value for key, value in (user_context or {}).items()
+        if (key in keys if keys is not None else key not in VOLATILE_CONTEXT_KEYS)
+    }
+
+def semantic_scope(context, question):
+    """Semantic cache partition for a question: its user context and the destination it names.
+
+    Questions about different destinations embed close together ("... in Paris" and
+    "... in Tokyo"), so they must never share an answer however similar they look.
+    """
+    return context, query_destination(question)
 
 class RAGEngine:
-    def __init__(self):
+    def __init__(self, persist_directory=None, collection_name=DEFAULT_COLLECTION, embeddings=None,
+                 query_concurrency=DEFAULT_QUERY_CONCURRENCY, query_timeout=DEFAULT_QUERY_TIMEOUT,
+                 context_keys=None, llm=None, chunk_size=1000, chunk_overlap=200):
         load_dotenv()
-        self.embeddings = OpenAIEmbeddings()
-        self.vector_store = None
-        self.qa_chain = None
-        
-    def load_documents(self, documents):
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
+        # Cached, batched embeddings; the backend is picked by RAG_EMBEDDINGS unless given
+        self.embeddings = embeddings or make_embeddings()
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap
+        )
+        # Chunks are stored on disk under content-hash IDs, so a restart reuses them as-is
+        self.vector_store = Chroma(
+            collection_name=collection_name,
+            embedding_function=self.embeddings,
+            persist_directory=persist_directory or os.getenv("RAG_PERSIST_DIRECTORY", DEFAULT_PERSIST_DIRECTORY),
         )
-        texts = text_splitter.split_documents(documents)
-        self.vector_store = Chroma.from_documents(texts, self.embeddings)
+        # Lexical index over the stored chunks, rebuilt from the collection without re-embedding
+        self.bm25 = BM25Index()
+        stored = self.vector_store.get(include=["documents", "metadatas"])
+        for id_, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+            self.bm25.add(id_, text, (metadata or {}).get("destination", "any"))
+        self.retriever = HybridRetriever(engine=self)
         self.qa_chain = RetrievalQA.from_chain_type(
-            llm=OpenAI(),
+            llm=llm or OpenAI(),
             chain_type="stuff",
-            retriever=self.vector_store.as_retriever()
+            retriever=self.retriever
         )
-    
+        # The chain blocks, so it runs on a bounded pool of its own, never on the event loop
+        self.query_timeout = query_timeout
+        self.context_keys = context_keys
+        self._executor = ThreadPoolExecutor(max_workers=query_concurrency, thread_name_prefix="rag-query")
+        self._query_slots = asyncio.Semaphore(query_concurrency)
+        self.result_cache = TTLCache(DEFAULT_RESULT_CACHE_SIZE, DEFAULT_RESULT_CACHE_TTL)
+        self.context_builder = UserContextBuilder(CONTEXT_TOKEN_BUDGET)
+        # Tokens of the prompts sent to the LLM, and how many of them were the question
+        # and user context rather than retrieved chunks and the chain's template
+        self.prompt_tokens = {
+            "queries": 0, "total": 0, "max": 0, "last": 0,
+            "question_and_context_total": 0, "documents_total": 0,
+        }
+        self.semantic_cache = SemanticCache(
+            DEFAULT_SEMANTIC_THRESHOLD, DEFAULT_SEMANTIC_CACHE_SIZE, DEFAULT_SEMANTIC_CACHE_TTL
+        )
+
+    def split(self, documents):
+        """Split documents into destination- and topic-tagged chunks keyed by content-hash ID.
+
+        Duplicate chunks collapse into one.
+        """
+        return {chunk_id(tag_chunk(chunk)): chunk for chunk in self.text_splitter.split_documents(documents)}
+
+    def stored_ids(self):
+        return set(self.vector_store.get(include=[])["ids"])
+
+    def load_documents(self, documents):
+        """Make the collection hold exactly the chunks of documents.
+
+        Only chunks that are not stored yet are embedded, and stored chunks that no longer
+        appear in documents are deleted, so reloading a corpus costs time proportional to
+        what changed. Returns counts of added, deleted and unchanged chunks.
+        """
+        chunks = self.split(documents)
+        stored = self.stored_ids()
+        removed = list(stored - chunks.keys())
+        self._delete_chunks(removed)
+        added = self._add_chunks({id_: chunk for id_, chunk in chunks.items() if id_ not in stored})
+        return {"added": added, "deleted": len(removed), "unchanged": len(chunks) - added}
+
+    def ingest(self, source, **options):
+        """Stream a corpus directory or JSONL file into the collection (see rag.ingest)."""
+        from rag.ingest import ingest
+        options.setdefault("chunk_size", self.chunk_size)
+        options.setdefault("chunk_overlap", self.chunk_overlap)
+        return ingest(self, source, **options)
+
+    def add_documents(self, documents):
+        """Add documents without touching anything already stored; returns chunks added."""
+        chunks = self.split(documents)
+        stored = self.stored_ids()
+        return self._add_chunks({id_: chunk for id_, chunk in chunks.items() if id_ not in stored})
+
+    def delete_documents(self, documents):
+        """Delete the chunks of documents from the collection; returns chunks deleted."""
+        removed = list(self.split(documents).keys() & self.stored_ids())
+        self._delete_chunks(removed)
+        return len(removed)
+
+    def _add_chunks(self, chunks):
+        ids = list(chunks)
+        for start in range(0, len(ids), ADD_BATCH_SIZE):
+            batch = ids[start:start + ADD_BATCH_SIZE]
+            self.vector_store.add_documents([chunks[id_] for id_ in batch], ids=batch)
+            for id_ in batch:
+                self.bm25.add(id_, chunks[id_].page_content, chunks[id_].metadata["destination"])
+        if ids:
+            # Cached answers may rest on the old corpus
+            self.result_cache.clear()
+            self.semantic_cache.clear()
+        return len(ids)
+
+    def _delete_chunks(self, ids):
+        if ids:
+            self.vector_store.delete(ids=ids)
+            for id_ in ids:
+                self.bm25.remove(id_)
+            self.result_cache.clear()
+            self.semantic_cache.clear()
+
     async def query(self, question: str, user_context: dict) -> str:
-        # Add user context to the question
-        enhanced_question = f"User context: {user_context}\nQuestion: {question}"
-        response = self.qa_chain.run(enhanced_question)
+        """Answer a question without blocking the event loop.
+
+        Repeat questions with the same relevant user context are answered from the result
+        cache, and paraphrases of an answered question from the semantic cache. Otherwise
+        the chain runs on the query pool, at most query_concurrency at a time;
+        asyncio.TimeoutError is raised if it takes longer than query_timeout.
+        """
+        # Only the profile fields relevant to this question go into the prompt, and the
+        # caches key on exactly that compact context
+        normalized = normalize_question(question)
+        context, _ = self.context_builder.build(
+            relevant_context(user_context, self.context_keys), question,
+            user_id=(user_context or {}).get("user_id"),
+        )
+        key = (normalized, context)
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            return cached
+
+        loop = asyncio.get_running_loop()
+        async with self._query_slots:
+            vector = await asyncio.wait_for(
+                loop.run_in_executor(self._executor, self.embeddings.embed_query, normalized),
+                self.query_timeout,
+            )
+            scope = semantic_scope(context, question)
+            cached, _ = self.semantic_cache.lookup(vector, scope)
+            if cached is not None:
+                self.result_cache.put(key, cached)
+                return cached
+
+            # Add user context to the question
+            enhanced_question = f"User context:\n{context}\nQuestion: {question}"
+            # The chain runs on a worker thread, so prompts are recorded back on the loop
+            recorder = PromptRecorder(lambda prompt: loop.call_soon_threadsafe(
+                self._record_prompt, prompt, count_tokens(enhanced_question)
+            ))
+            response = await asyncio.wait_for(
+                loop.run_in_executor(
+                    self._executor, functools.partial(self.qa_chain.run, enhanced_question, callbacks=[recorder])
+                ),
+                self.query_timeout,
+            )
+        self.result_cache.put(key, response)
+        self.semantic_cache.store(vector, scope, response)
         return response
+
+    def _record_prompt(self, prompt, question_tokens):
+        tokens = count_tokens(prompt)
+        stats = self.prompt_tokens
+        stats["queries"] += 1
+        stats["total"] += tokens
+        stats["max"] = max(stats["max"], tokens)
+        stats["last"] = tokens
+        stats["question_and_context_total"] += question_tokens
+        stats["documents_total"] += tokens - question_tokens
+        logger.info("RAG query prompt: %d tokens, %d of them question and user context", tokens, question_tokens)
+
+    def cache_stats(self):
+        """Hit rates of the exact and semantic answer caches, and prompt token counts."""
+        return {
+            "exact": self.result_cache.stats(),
+            "semantic": self.semantic_cache.stats(),
+            "prompt_tokens": dict(self.prompt_tokens),
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False)
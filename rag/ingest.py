@@ -0,0 +1,192 @@
+"""Streaming ingestion of a document corpus into a RAGEngine.
+
+Documents are read lazily from a directory or a JSONL file, split in a process pool,
+embedded and upserted in batches. The stages run concurrently and hand work to each
+other through bounded queues, so a slow stage holds back the ones before it and memory
+stays flat however large the corpus is.
+
+    python -m rag.ingest path/to/corpus
+"""
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from langchain.schema import Document
+from rag.retrieval import chunk_id, tag_chunk
+
+# Files read from a corpus directory
+TEXT_EXTENSIONS = (".txt", ".md")
+
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_QUEUE_SIZE = 8
+# Documents handed to a split worker per task
+DOCUMENTS_PER_TASK = 32
+
+_DONE = object()
+
+def read_documents(source):
+    """Yield Documents from a directory of text files or from a JSONL file.
+
+    JSONL lines are objects with "text" (or "page_content") and optional "metadata".
+    """
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if name.endswith(TEXT_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    with open(path, encoding="utf-8") as f:
+                        yield Document(page_content=f.read(), metadata={"source": path})
+                elif name.endswith(".jsonl"):
+                    yield from read_documents(os.path.join(root, name))
+        return
+    with open(source, encoding="utf-8") as f:
+        for number, line in enumerate(f):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            metadata = {"source": f"{source}:{number + 1}", **record.get("metadata", {})}
+            yield Document(page_content=record.get("text", record.get("page_content", "")), metadata=metadata)
+
+# Splitters built in this (worker) process, by (chunk_size, chunk_overlap)
+_splitters = {}
+
+def _split_task(documents, chunk_size, chunk_overlap):
+    # Runs in a worker process: split, tag and hash one batch of (text, metadata) pairs
+    splitter = _splitters.get((chunk_size, chunk_overlap))
+    if splitter is None:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        _splitters[(chunk_size, chunk_overlap)] = splitter
+    chunks = splitter.split_documents([Document(page_content=text, metadata=metadata) for text, metadata in documents])
+    return [(chunk_id(tag_chunk(chunk)), chunk.page_content, chunk.metadata) for chunk in chunks]
+
+def _batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _stage(work, inbox, outbox, errors):
+    # Run work on every batch from inbox; after a failure keep draining so upstream never blocks
+    while True:
+        batch = inbox.get()
+        if batch is _DONE:
+            if outbox is not None:
+                outbox.put(_DONE)
+            return
+        if errors:
+            continue
+        try:
+            result = work(batch)
+            if outbox is not None and result:
+                outbox.put(result)
+        except Exception as error:
+            errors.append(error)
+
+def ingest(engine, source, batch_size=DEFAULT_BATCH_SIZE, split_workers=None,
+           queue_size=DEFAULT_QUEUE_SIZE, chunk_size=1000, chunk_overlap=200):
+    """Stream the documents under source into engine's collection; returns ingestion stats.
+
+    Chunks already in the collection (same content-hash ID) are skipped without being
+    embedded. Nothing is deleted: use RAGEngine.load_documents to mirror a corpus exactly.
+    """
+    stats = {"documents": 0, "chunks": 0, "added": 0, "skipped": 0}
+    started = time.perf_counter()
+    chunk_queue = queue.Queue(maxsize=queue_size)
+    upsert_queue = queue.Queue(maxsize=queue_size)
+    errors = []
+    collection = engine.vector_store._collection
+    # IDs embedded but not yet upserted, so a chunk repeated in the corpus is embedded once;
+    # once stored, the collection lookup catches repeats and the ID leaves the set
+    queued = set()
+
+    def embed(batch):
+        # Check queued before the collection: upsert() stores an ID before dropping it here
+        new = {}
+        for chunk in batch:
+            if chunk[0] not in queued:
+                new.setdefault(chunk[0], chunk)
+        existing = set(collection.get(ids=list(new), include=[])["ids"]) if new else set()
+        new = [chunk for id_, chunk in new.items() if id_ not in existing]
+        queued.update(id_ for id_, _, _ in new)
+        stats["skipped"] += len(batch) - len(new)
+        if not new:
+            return None
+        return new, engine.embeddings.embed_documents([text for _, text, _ in new])
+
+    def upsert(item):
+        chunks, vectors = item
+        collection.upsert(
+            ids=[id_ for id_, _, _ in chunks],
+            embeddings=vectors,
+            documents=[text for _, text, _ in chunks],
+            metadatas=[metadata for _, _, metadata in chunks],
+        )
+        for id_, text, metadata in chunks:
+            engine.bm25.add(id_, text, metadata["destination"])
+        queued.difference_update(id_ for id_, _, _ in chunks)
+        stats["added"] += len(chunks)
+
+    stages = [
+        threading.Thread(target=_stage, args=(embed, chunk_queue, upsert_queue, errors), daemon=True),
+        threading.Thread(target=_stage, args=(upsert, upsert_queue, None, errors), daemon=True),
+    ]
+    for thread in stages:
+        thread.start()
+
+    workers = split_workers or os.cpu_count() or 1
+
+    def split_results(pool):
+        # Keep a bounded number of split tasks in flight and yield chunks as they finish
+        pending = set()
+        limit = 2 * workers
+        documents = ((document.page_content, document.metadata) for document in read_documents(source))
+        for task in _batched(documents, DOCUMENTS_PER_TASK):
+            stats["documents"] += len(task)
+            pending.add(pool.submit(_split_task, task, chunk_size, chunk_overlap))
+            while len(pending) >= limit:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+        for future in pending:
+            yield from future.result()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for batch in _batched(split_results(pool), batch_size):
+                if errors:
+                    break
+                stats["chunks"] += len(batch)
+                chunk_queue.put(batch)
+    finally:
+        chunk_queue.put(_DONE)
+        for thread in stages:
+            thread.join()
+    if errors:
+        raise errors[0]
+    if stats["added"]:
+        engine.result_cache.clear()
+        engine.semantic_cache.clear()
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+def main(argv=None):
+    from rag.engine import RAGEngine
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print("usage: python -m rag.ingest <directory or .jsonl file>")
+        return 2
+    stats = ingest(RAGEngine(), argv[0])
+    print(f"Ingested {stats['documents']} documents into {stats['chunks']} chunks "
+          f"({stats['added']} added, {stats['skipped']} already stored) in {stats['seconds']:.1f} s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
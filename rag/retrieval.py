@@ -0,0 +1,183 @@
+import hashlib
+import json
+import math
+import re
+from typing import Any, List
+from langchain.schema import BaseRetriever, Document
+from keyword_index import STOPWORDS, stem
+
+# Destinations the travel agents know about, matched as lowercase substrings
+KNOWN_DESTINATIONS = (
+    "paris", "tokyo", "new york", "london", "bali", "rome",
+    "sydney", "dubai", "bangkok", "barcelona", "mexico",
+)
+
+# Topic -> words that mark a chunk as being about it
+TOPIC_KEYWORDS = {
+    "food": ("food", "restaurant", "cuisine", "dish", "eat", "vegetarian", "vegan", "cafe", "market"),
+    "transport": ("metro", "subway", "train", "bus", "taxi", "airport", "transit", "pass", "ferry"),
+    "weather": ("weather", "temperature", "rain", "season", "climate", "humid", "sunny"),
+    "events": ("festival", "event", "concert", "parade", "celebration", "exhibition"),
+    "accommodation": ("hotel", "hostel", "stay", "room", "accommodation", "neighborhood"),
+    "activities": ("museum", "tour", "visit", "attraction", "hike", "beach", "temple", "gallery"),
+    "budget": ("budget", "cost", "price", "cheap", "expensive", "money", "tip"),
+    "safety": ("safety", "safe", "scam", "emergency", "crime", "insurance"),
+}
+
+# Metadata value for chunks not about a single known destination
+ANY_DESTINATION = "any"
+
+# BM25 parameters and the reciprocal rank fusion constant
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+
+_WORD = re.compile(r"\w+")
+
+def chunk_id(chunk):
+    """Content-hash ID for a chunk: the same text and metadata always get the same ID."""
+    digest = hashlib.sha256(chunk.page_content.encode("utf-8"))
+    digest.update(json.dumps(chunk.metadata, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+def tokenize(text):
+    """Lowercase, drop stopwords and stem, keeping repeats (BM25 needs term frequencies)."""
+    return [stem(word) for word in _WORD.findall(text.lower()) if word not in STOPWORDS]
+
+def detect_destination(text):
+    """Return the known destination named first in text, or None."""
+    text = text.lower()
+    positions = [(text.find(name), name) for name in KNOWN_DESTINATIONS if name in text]
+    return min(positions)[1] if positions else None
+
+def detect_topic(text):
+    """Return the topic whose keywords appear most often in text, or "general"."""
+    words = [stem(word) for word in _WORD.findall(text.lower())]
+    counts = {
+        topic: sum(words.count(stem(keyword)) for keyword in keywords)
+        for topic, keywords in TOPIC_KEYWORDS.items()
+    }
+    topic, count = max(counts.items(), key=lambda item: item[1])
+    return topic if count else "general"
+
+def tag_chunk(chunk):
+    """Fill in destination and topic metadata unless the source document already set them."""
+    metadata = chunk.metadata
+    if "destination" not in metadata:
+        metadata["destination"] = detect_destination(chunk.page_content) or ANY_DESTINATION
+    metadata["destination"] = metadata["destination"].lower()
+    metadata.setdefault("topic", detect_topic(chunk.page_content))
+    return chunk
+
+def query_destination(query):
+    """Destination a query is about: named in the question itself first, else in its context."""
+    question = query.rsplit("Question:", 1)[-1]
+    return detect_destination(question) or detect_destination(query)
+
+class BM25Index:
+    """BM25 over chunk IDs, partitioned by destination.
+
+    Scoring a query only walks the postings of its terms inside one destination's
+    partition (plus the destination-neutral chunks).
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._lengths = {}
+        self._chunks = {}
+
+    def __len__(self):
+        return len(self._chunks)
+
+    def add(self, item_id, text, destination=ANY_DESTINATION):
+        if item_id in self._chunks:
+            return
+        counts = {}
+        for term in tokenize(text):
+            counts[term] = counts.get(term, 0) + 1
+        postings = self._postings.setdefault(destination, {})
+        for term, count in counts.items():
+            postings.setdefault(term, {})[item_id] = count
+        self._lengths.setdefault(destination, {})[item_id] = sum(counts.values())
+        self._chunks[item_id] = (destination, tuple(counts))
+
+    def remove(self, item_id):
+        destination, chunk_terms = self._chunks.pop(item_id, (None, ()))
+        if destination is None:
+            return
+        postings = self._postings[destination]
+        for term in chunk_terms:
+            del postings[term][item_id]
+            if not postings[term]:
+                del postings[term]
+        del self._lengths[destination][item_id]
+
+    def search(self, query, destination=None, k=10):
+        """Return up to k (chunk id, score) pairs, best first.
+
+        With a destination, only that destination's chunks and destination-neutral ones
+        are scored; without one, every partition is.
+        """
+        if destination is None:
+            partitions = list(self._postings)
+        else:
+            partitions = [destination, ANY_DESTINATION]
+        terms = set(tokenize(query))
+        scores = {}
+        for partition in partitions:
+            postings = self._postings.get(partition)
+            if not postings:
+                continue
+            lengths = self._lengths[partition]
+            count = len(lengths)
+            average = sum(lengths.values()) / count
+            for term in terms:
+                matches = postings.get(term)
+                if not matches:
+                    continue
+                idf = math.log(1 + (count - len(matches) + 0.5) / (len(matches) + 0.5))
+                for item_id, tf in matches.items():
+                    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * lengths[item_id] / average)
+                    scores[item_id] = scores.get(item_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: -item[1])[:k]
+
+class HybridRetriever(BaseRetriever):
+    """Retriever fusing BM25 and vector similarity with reciprocal rank fusion.
+
+    The query's destination (if it names one) restricts both searches: BM25 scores only
+    that destination's partition, and the vector search passes a metadata filter so
+    Chroma never compares the query with other destinations' chunks.
+    """
+
+    engine: Any
+    k: int = 4
+    fetch_k: int = 20
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        destination = query_destination(query)
+        where = None
+        if destination:
+            where = {"destination": {"$in": [destination, ANY_DESTINATION]}}
+
+        vector_hits = self.engine.vector_store.similarity_search(query, k=self.fetch_k, filter=where)
+        lexical_hits = self.engine.bm25.search(query, destination, self.fetch_k)
+
+        fused = {}
+        documents = {}
+        for rank, document in enumerate(vector_hits):
+            id_ = chunk_id(document)
+            documents[id_] = document
+            fused[id_] = fused.get(id_, 0.0) + 1.0 / (RRF_K + rank + 1)
+        for rank, (id_, _) in enumerate(lexical_hits):
+            fused[id_] = fused.get(id_, 0.0) + 1.0 / (RRF_K + rank + 1)
+
+        best = sorted(fused, key=lambda id_: -fused[id_])[:self.k]
+        missing = [id_ for id_ in best if id_ not in documents]
+        if missing:
+            stored = self.engine.vector_store.get(ids=missing, include=["documents", "metadatas"])
+            for id_, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+                documents[id_] = Document(page_content=text, metadata=metadata or {})
+        return [documents[id_] for id_ in best if id_ in documents]
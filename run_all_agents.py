@@ -14,6 +14,7 @@ if __name__ == "__main__":
     bureau.add(enhanced_travel_planning.dietary_agent)
     bureau.add(enhanced_travel_planning.transportation_agent)
     bureau.add(enhanced_travel_planning.events_agent)
+    bureau.add(enhanced_travel_planning.destination_advisor_agent)
     
     print("\n=== ZenJourney Multi-Agent Travel Planning System ===\n")
     print("Starting all agents. The travel planning API will be available at:")
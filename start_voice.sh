@@ -0,0 +1,2 @@
+#!/bin/bash
+uvicorn process_audio:app --host 0.0.0.0 --port ${PORT:-8002}
@@ -0,0 +1,140 @@
+"""Pluggable streaming speech-to-text backends.
+
+A backend's open() returns a TranscriptStream. Audio chunks go in through send(), and
+finish() marks the end of the audio. Transcript events come out of events() as they
+arrive:
+
+    {"type": "interim" | "final", "transcript": str, "speech_final": bool}
+
+"interim" transcripts may still change, while a "final" one covers its stretch of
+audio for good. The STT_BACKEND env var picks the backend: "deepgram" (default)
+streams to Deepgram live transcription, and "local" is an offline stand-in for tests
+and load tests.
+"""
+import asyncio
+import os
+from abc import ABC, abstractmethod
+
+_CLOSED = object()
+
+class TranscriptStream(ABC):
+    """One streaming transcription session: send audio in, read transcript events out."""
+
+    def __init__(self):
+        self._events = asyncio.Queue()
+
+    def emit(self, transcript, is_final, speech_final=False):
+        self._events.put_nowait({
+            "type": "final" if is_final else "interim",
+            "transcript": transcript,
+            "speech_final": speech_final,
+        })
+
+    def close(self):
+        self._events.put_nowait(_CLOSED)
+
+    @abstractmethod
+    async def send(self, audio):
+        """Feed one chunk of audio to the backend."""
+
+    @abstractmethod
+    async def finish(self):
+        """No more audio: flush the last transcripts, then end events()."""
+
+    async def events(self):
+        while True:
+            event = await self._events.get()
+            if event is _CLOSED:
+                return
+            yield event
+
+class LocalTranscriptStream(TranscriptStream):
+    # Treats each chunk as UTF-8 text "heard" in the audio. Every chunk yields an interim
+    # transcript of the utterance so far, and the utterance is final once a chunk ends
+    # with sentence punctuation or the stream finishes.
+
+    def __init__(self, latency):
+        super().__init__()
+        self.latency = latency
+        self._words = []
+
+    async def send(self, audio):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        text = audio.decode("utf-8", errors="ignore") if isinstance(audio, bytes) else audio
+        self._words.extend(text.split())
+        if not self._words:
+            return
+        utterance = " ".join(self._words)
+        if text.rstrip().endswith((".", "?", "!")):
+            self._words = []
+            self.emit(utterance, True, speech_final=True)
+        else:
+            self.emit(utterance, False)
+
+    async def finish(self):
+        if self._words:
+            self.emit(" ".join(self._words), True, speech_final=True)
+            self._words = []
+        self.close()
+
+class LocalStreamingBackend:
+    """Offline stand-in: no network, deterministic transcripts, optional simulated latency."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    async def open(self, **options):
+        return LocalTranscriptStream(self.latency)
+
+class DeepgramTranscriptStream(TranscriptStream):
+    def __init__(self, connection):
+        super().__init__()
+        self.connection = connection
+
+    async def send(self, audio):
+        await self.connection.send(audio)
+
+    async def finish(self):
+        try:
+            await self.connection.finish()
+        finally:
+            self.close()
+
+class DeepgramStreamingBackend:
+    """Deepgram live transcription over the SDK's async websocket client."""
+
+    def __init__(self, client, model="nova-2"):
+        self.client = client
+        self.model = model
+
+    async def open(self, **options):
+        from deepgram import LiveOptions, LiveTranscriptionEvents
+        connection = self.client.listen.asynclive.v("1")
+        stream = DeepgramTranscriptStream(connection)
+
+        async def on_transcript(_, result, **kwargs):
+            transcript = result.channel.alternatives[0].transcript
+            if transcript:
+                stream.emit(transcript, result.is_final, bool(result.speech_final))
+
+        async def on_close(*args, **kwargs):
+            stream.close()
+
+        connection.on(LiveTranscriptionEvents.Transcript, on_transcript)
+        connection.on(LiveTranscriptionEvents.Close, on_close)
+        live_options = LiveOptions(model=self.model, smart_format=True, interim_results=True, **options)
+        if not await connection.start(live_options):
+            raise ConnectionError("Could not open a Deepgram live transcription stream")
+        return stream
+
+def make_streaming_backend(name=None, deepgram_client=None):
+    """Build the backend named by name (default: the STT_BACKEND env var, else "deepgram")."""
+    name = name or os.getenv("STT_BACKEND", "deepgram")
+    if name == "local":
+        return LocalStreamingBackend(float(os.getenv("STT_LOCAL_LATENCY", "0")))
+    if name == "deepgram":
+        if deepgram_client is None:
+            raise ValueError("The deepgram streaming backend needs a Deepgram client")
+        return DeepgramStreamingBackend(deepgram_client)
+    raise ValueError(f"Unknown streaming backend {name!r}")
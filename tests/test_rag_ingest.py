@@ -0,0 +1,53 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("langchain")
+
+from rag.cache import SemanticCache, TTLCache
+from rag.embeddings import HashEmbeddings
+from rag.ingest import ingest
+from rag.retrieval import BM25Index
+
+
+class FakeCollection:
+    """Keeps upserted chunks by ID and rejects duplicate IDs in one call, as Chroma does."""
+
+    def __init__(self):
+        self.chunks = {}
+
+    def get(self, ids=None, include=None):
+        return {"ids": [id_ for id_ in ids if id_ in self.chunks]}
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        if len(set(ids)) != len(ids):
+            raise ValueError("Expected IDs to be unique")
+        self.chunks.update(zip(ids, documents))
+
+
+def fake_engine():
+    return SimpleNamespace(
+        vector_store=SimpleNamespace(_collection=FakeCollection()),
+        embeddings=HashEmbeddings(32),
+        bm25=BM25Index(),
+        result_cache=TTLCache(),
+        semantic_cache=SemanticCache(),
+    )
+
+
+def test_ingest_embeds_a_repeated_chunk_once(tmp_path):
+    boilerplate = "Prices vary with the season, so plan ahead."
+    corpus = tmp_path / "corpus.jsonl"
+    with open(corpus, "w", encoding="utf-8") as f:
+        for text in (boilerplate, "The Louvre in Paris opens at nine.", boilerplate):
+            f.write(json.dumps({"text": text, "metadata": {"source": "guide"}}) + "\n")
+
+    engine = fake_engine()
+    stats = ingest(engine, str(corpus), split_workers=1)
+
+    assert stats["chunks"] == 3
+    assert stats["added"] == 2
+    assert stats["skipped"] == 1
+    assert len(engine.vector_store._collection.chunks) == 2
+    assert len(engine.bm25) == 2
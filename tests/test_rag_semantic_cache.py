@@ -0,0 +1,32 @@
+import pytest
+
+pytest.importorskip("langchain")
+
+from rag.cache import SemanticCache
+from rag.embeddings import HashEmbeddings
+from rag.engine import normalize_question, semantic_scope
+
+PARIS = "What are the best vegetarian restaurants in Paris?"
+TOKYO = "What are the best vegetarian restaurants in Tokyo?"
+
+
+def embed(question):
+    return HashEmbeddings().embed_query(normalize_question(question))
+
+
+def test_semantic_cache_does_not_answer_across_destinations():
+    # Low enough that the Paris and Tokyo questions would match each other
+    cache = SemanticCache(threshold=0.8)
+    cache.store(embed(PARIS), semantic_scope("", PARIS), "Paris answer")
+
+    answer, similarity = cache.lookup(embed(TOKYO), semantic_scope("", TOKYO))
+    assert answer is None
+    assert similarity is None
+
+    answer, _ = cache.lookup(embed("What are the very best vegetarian restaurants in Paris?"), semantic_scope("", PARIS))
+    assert answer == "Paris answer"
+
+    # Without the destination in the key the Tokyo question would get the Paris answer
+    unscoped = SemanticCache(threshold=0.8)
+    unscoped.store(embed(PARIS), "", "Paris answer")
+    assert unscoped.lookup(embed(TOKYO), "")[0] == "Paris answer"
@@ -0,0 +1,75 @@
+import asyncio
+import importlib
+import logging
+from datetime import date, timedelta
+
+import pytest
+
+
+class FakeContext:
+    logger = logging.getLogger("test")
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, destination, message):
+        self.sent.append(message)
+
+
+@pytest.fixture(scope="module")
+def vacation(tmp_path_factory):
+    # Creating the agents writes their keys to the working directory
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.chdir(tmp_path_factory.mktemp("agents"))
+    yield importlib.import_module("vacation_planning_sync")
+    monkeypatch.undo()
+
+
+def stay_request(vacation, budget):
+    check_in = date.today() + timedelta(days=30)
+    return vacation.VacationRequest(
+        destination="Tokyo",
+        start_date=check_in.isoformat(),
+        end_date=(check_in + timedelta(days=7)).isoformat(),
+        budget=budget,
+        preferences="Cultural experiences, good food, technology",
+    )
+
+
+def test_hotel_quote_follows_store_price_update(vacation):
+    msg = stay_request(vacation, 3000.0)
+    ctx = FakeContext()
+    asyncio.run(vacation.handle_hotel_request(ctx, "user", msg))
+    assert ctx.sent[-1].name == "Imperial Hotel"
+    assert ctx.sent[-1].total_price == 1750.0
+
+    offer_id = next(i for i, hotel in vacation.hotel_store.offers("Tokyo") if hotel["name"] == "Imperial Hotel")
+    vacation.hotel_store.update(offer_id, price_per_night=10.0)
+
+    asyncio.run(vacation.handle_hotel_request(ctx, "user", msg))
+    asyncio.run(vacation.handle_activities_request(ctx, "user", msg))
+    hotel, activities = ctx.sent[-2:]
+    assert hotel.price_per_night == 10.0
+    assert hotel.total_price == 70.0
+    flight = vacation.flight_store.cheapest("Tokyo")
+    assert flight["price"] + hotel.total_price + activities.total_price <= msg.budget
+
+
+def test_activity_index_follows_store_changes_one_offer_at_a_time(vacation, monkeypatch):
+    store = vacation.activity_store
+    vacation.index_activities("Paris")
+    cruise = next(i for i, activity in store.offers("Paris") if activity["name"] == "Seine River Cruise")
+    tour = next(i for i, activity in store.offers("Paris") if activity["name"] == "Montmartre Walking Tour")
+
+    # Catching up must not walk the destination's whole catalog again
+    monkeypatch.setattr(store, "offers", lambda *args, **kwargs: pytest.fail("re-indexed the destination"))
+    store.update(cruise, price=30.0)
+    store.update(tour, name="Montmartre Food Tour", tags=["food"])
+    store.remove(cruise)
+    added = store.add("Paris", {"name": "Catacombs Tour", "price": 30.0, "tags": ["history"]})
+    vacation.index_activities("Paris")
+
+    assert tour in vacation.activity_index.matches("Paris", "food")
+    assert tour not in vacation.activity_index.matches("Paris", "walking")
+    assert cruise not in vacation.activity_index.matches("Paris", "river")
+    assert added in vacation.activity_index.matches("Paris", "catacombs")
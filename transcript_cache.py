@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "transcript_cache.sqlite3")
+# Most transcripts kept on disk before the least recently used ones are dropped
+DEFAULT_MAX_ENTRIES = 10000
+
+def transcript_key(audio_url, content_hash):
+    """Cache key for one clip: the same URL serving different audio gets a different key."""
+    return hashlib.sha256(f"{audio_url}\0{content_hash}".encode("utf-8")).hexdigest()
+
+class TranscriptCache:
+    """LRU cache of transcripts with their sentiment and topics, persisted in SQLite.
+
+    Entries are keyed by audio URL plus the hash of the audio fetched from it, so a
+    retried or replayed clip is never transcribed twice, and a URL whose audio changed
+    misses. Past max_entries the least recently used entries are evicted.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS transcripts (key TEXT PRIMARY KEY, transcript TEXT NOT NULL, "
+            "sentiment TEXT NOT NULL, topics TEXT NOT NULL, used INTEGER NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS transcripts_used ON transcripts (used)")
+        self._db.commit()
+        # Recency is a counter carried over from the stored entries, not wall-clock time
+        self._clock = self._db.execute("SELECT COALESCE(MAX(used), 0) FROM transcripts").fetchone()[0]
+        self._entries = self._db.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+
+    def __len__(self):
+        return self._entries
+
+    def _tick(self):
+        self._clock += 1
+        return self._clock
+
+    def get(self, audio_url, content_hash):
+        """Return {"transcript", "sentiment", "topics"} for the clip, or None."""
+        key = transcript_key(audio_url, content_hash)
+        row = self._db.execute(
+            "SELECT transcript, sentiment, topics FROM transcripts WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self._db.execute("UPDATE transcripts SET used = ? WHERE key = ?", (self._tick(), key))
+        self._db.commit()
+        self.hits += 1
+        return {"transcript": row[0], "sentiment": row[1], "topics": json.loads(row[2])}
+
+    def put(self, audio_url, content_hash, transcript, sentiment, topics):
+        key = transcript_key(audio_url, content_hash)
+        if self._db.execute("SELECT 1 FROM transcripts WHERE key = ?", (key,)).fetchone() is None:
+            self._entries += 1
+        self._db.execute(
+            "INSERT OR REPLACE INTO transcripts (key, transcript, sentiment, topics, used) VALUES (?, ?, ?, ?, ?)",
+            (key, transcript, sentiment, json.dumps(list(topics)), self._tick()),
+        )
+        excess = self._entries - self.max_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM transcripts WHERE key IN (SELECT key FROM transcripts ORDER BY used LIMIT ?)", (excess,)
+            )
+            self._entries -= excess
+            self.evictions += excess
+        self._db.commit()
+
+    def clear(self):
+        self._db.execute("DELETE FROM transcripts")
+        self._db.commit()
+        self._entries = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        self._db.close()
@@ -1,13 +1,74 @@
 #!/usr/bin/env python3
 from uagents import Agent, Context, Model
+from payload_codec import enable_compact_payloads, reply
 
 class TransportationRequest(Model):
     destination: str
     duration_days: int
+    rides_per_day: int = 4  # Expected public transport rides per day
 
 class TransportationResponse(Model):
     recommendations: str
     estimated_cost: float
+    pass_plan: list = []  # Cheapest combination of fares and passes covering the stay
+
+# Fare tables per city, in USD-equivalent. "single" is one pay-as-you-go ride, "daily_cap"
+# caps pay-as-you-go spending per day where the city has one, and each pass covers
+# "days" consecutive days of unlimited rides.
+FARE_TABLES = {
+    "paris": {
+        "single": 2.3,
+        "daily_cap": None,
+        "passes": [
+            {"name": "Mobilis day pass", "days": 1, "price": 9.3},
+            {"name": "Paris Visite 2-day pass", "days": 2, "price": 24.5},
+            {"name": "Paris Visite 3-day pass", "days": 3, "price": 33.4},
+            {"name": "Paris Visite 5-day pass", "days": 5, "price": 48.0},
+            {"name": "Navigo Découverte weekly pass (incl. card)", "days": 7, "price": 39.0},
+        ],
+    },
+    "tokyo": {
+        "single": 1.5,
+        "daily_cap": None,
+        "passes": [
+            {"name": "Tokyo Metro 24-hour Ticket", "days": 1, "price": 4.2},
+            {"name": "Tokyo Subway Ticket (24h)", "days": 1, "price": 5.6},
+            {"name": "Tokyo Subway Ticket (48h)", "days": 2, "price": 8.4},
+            {"name": "Tokyo Subway Ticket (72h)", "days": 3, "price": 10.5},
+        ],
+    },
+    "new york": {
+        "single": 2.9,
+        "daily_cap": None,
+        "passes": [
+            {"name": "7-day unlimited MetroCard / OMNY fare cap", "days": 7, "price": 34.0},
+        ],
+    },
+    "london": {
+        "single": 3.5,
+        "daily_cap": 10.8,
+        "passes": [
+            {"name": "7-day Travelcard (zones 1-2)", "days": 7, "price": 56.0},
+        ],
+    },
+    "bali": {
+        "single": 6.0,
+        "daily_cap": None,
+        "passes": [
+            {"name": "Scooter rental day", "days": 1, "price": 6.0},
+            {"name": "Private driver day", "days": 1, "price": 45.0},
+            {"name": "Weekly scooter rental", "days": 7, "price": 35.0},
+        ],
+    },
+    None: {
+        "single": 3.0,
+        "daily_cap": None,
+        "passes": [
+            {"name": "Day pass", "days": 1, "price": 10.0},
+            {"name": "Weekly pass", "days": 7, "price": 40.0},
+        ],
+    },
+}
 
 # Create the transportation agent
 transportation_agent = Agent(
@@ -25,22 +86,96 @@ async def handle_transportation_request(ctx: Context, sender: str, msg: Transpor
     ctx.logger.info(f"Received transportation request for {msg.destination} for {msg.duration_days} days")
     
     # Get transportation recommendations
-    recommendations, estimated_cost = get_transportation_info(msg.destination, msg.duration_days)
+    recommendations, estimated_cost, pass_plan = get_transportation_info(
+        msg.destination, msg.duration_days, msg.rides_per_day
+    )
     
     # Create and send the response
     response = TransportationResponse(
         recommendations=recommendations,
-        estimated_cost=estimated_cost
+        estimated_cost=estimated_cost,
+        pass_plan=pass_plan
     )
-    await ctx.send(sender, response)
+    await reply(ctx, sender, response)
+
+# Accept TransportationRequest as a compact payload from peers that negotiate it
+enable_compact_payloads(transportation_agent, {TransportationRequest: handle_transportation_request})
+
+def optimize_transit_passes(destination, duration_days, rides_per_day):
+    """Pick the cheapest mix of pay-as-you-go days and passes covering every day of the trip.
 
-def get_transportation_info(destination, duration_days):
-    """Get transportation recommendations and cost estimates."""
+    cost[d] is the cheapest way to cover days 1..d: either day d is pay-as-you-go, or a
+    pass of k days ends on day d (a pass may run past the end of the trip). Returns
+    (plan, total_cost), where plan lists each fare segment in day order.
+    """
+    destination = destination.lower()
+    city = next((name for name in FARE_TABLES if name and name in destination), None)
+    fares = FARE_TABLES[city]
+    duration_days = max(duration_days, 1)
+    rides_per_day = max(rides_per_day, 0)
+    
+    day_fare = fares["single"] * rides_per_day
+    if fares["daily_cap"] is not None:
+        day_fare = min(day_fare, fares["daily_cap"])
+    
+    cost = [0.0] * (duration_days + 1)
+    choice = [None] * (duration_days + 1)
+    for day in range(1, duration_days + 1):
+        cost[day] = cost[day - 1] + day_fare
+        for fare_pass in fares["passes"]:
+            candidate = cost[max(day - fare_pass["days"], 0)] + fare_pass["price"]
+            if candidate < cost[day]:
+                cost[day] = candidate
+                choice[day] = fare_pass
+    
+    # Walk the choices back from the last day, merging consecutive pay-as-you-go days
+    plan = []
+    day = duration_days
+    while day > 0:
+        fare_pass = choice[day]
+        if fare_pass is None:
+            first_day = day
+            while first_day > 1 and choice[first_day - 1] is None:
+                first_day -= 1
+            days = day - first_day + 1
+            plan.append({
+                "option": f"Pay per ride ({rides_per_day} rides/day)",
+                "first_day": first_day,
+                "last_day": day,
+                "cost": round(day_fare * days, 2),
+            })
+            day = first_day - 1
+        else:
+            first_day = max(day - fare_pass["days"] + 1, 1)
+            plan.append({
+                "option": fare_pass["name"],
+                "first_day": first_day,
+                "last_day": day,
+                "cost": fare_pass["price"],
+            })
+            day = first_day - 1
+    plan.reverse()
+    
+    return plan, round(cost[duration_days], 2)
+
+def format_pass_plan(pass_plan, estimated_cost):
+    """Render the optimized pass plan as a recommendations section."""
+    text = "\nCOST-OPTIMIZED FARE PLAN:\n"
+    for segment in pass_plan:
+        if segment["first_day"] == segment["last_day"]:
+            days = f"Day {segment['first_day']}"
+        else:
+            days = f"Days {segment['first_day']}-{segment['last_day']}"
+        text += f"- {days}: {segment['option']} (${segment['cost']:.2f})\n"
+    text += f"Estimated local transport cost: ${estimated_cost:.2f}\n"
+    return text
+
+def get_transportation_info(destination, duration_days, rides_per_day=4):
+    """Get transportation recommendations, the cheapest fare plan and its cost."""
     destination = destination.lower()
     
     # Default transportation recommendations
     recommendations = f"TRANSPORTATION OPTIONS IN {destination.upper()}:\n\n"
-    estimated_cost = 50.0 * duration_days  # Default estimate
     
     # Customize based on popular destinations
     if "paris" in destination:
@@ -74,7 +209,6 @@ TIPS:
 - Keep your ticket until you exit the system to avoid fines
 - Buses require validation upon boarding
 """
-        estimated_cost = 10.0 * duration_days  # €10 per day average for public transport
     
     elif "tokyo" in destination:
         recommendations += """
@@ -107,7 +241,6 @@ TIPS:
 - Station signs and announcements are in English
 - Google Maps works excellently for navigation in Japan
 """
-        estimated_cost = 15.0 * duration_days  # ¥1500 (approx $15) per day average
     
     elif "new york" in destination:
         recommendations += """
@@ -140,7 +273,6 @@ TIPS:
 - Use MTA Trip Planner or Google Maps for route planning
 - Stand clear of the closing doors!
 """
-        estimated_cost = 12.0 * duration_days  # $12 per day average
     
     elif "london" in destination:
         recommendations += """
@@ -177,7 +309,6 @@ TIPS:
 - Night buses operate when the Tube is closed
 - Download the TfL Go app for real-time information
 """
-        estimated_cost = 15.0 * duration_days  # £15 per day average
     
     elif "bali" in destination:
         recommendations += """
@@ -213,7 +344,6 @@ TIPS:
 - For day trips to multiple attractions, hiring a driver is most efficient
 - Download Grab and Gojek apps before arriving
 """
-        estimated_cost = 25.0 * duration_days  # $25 per day average (more if private driver)
     
     else:
         # Generic recommendations
@@ -244,9 +374,12 @@ SAFETY TIPS:
 - Have a paper map as backup for technology failures
 - Save your accommodation address in the local language
 """
-        estimated_cost = 20.0 * duration_days  # Generic estimate
     
-    return recommendations, estimated_cost
+    # Price the stay with the cheapest combination of single rides and passes
+    pass_plan, estimated_cost = optimize_transit_passes(destination, duration_days, rides_per_day)
+    recommendations += format_pass_plan(pass_plan, estimated_cost)
+    
+    return recommendations, estimated_cost, pass_plan
 
 if __name__ == "__main__":
     transportation_agent.run() 
\ No newline at end of file
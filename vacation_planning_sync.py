@@ -1,6 +1,17 @@
 from uagents import Agent, Bureau, Context, Model
-from datetime import datetime
+from datetime import date, datetime
+from typing import Optional
+import asyncio
+import heapq
+import itertools
 import json
+import os
+from inventory_store import OfferStore
+from offer_catalog import ACTIVITY_COLUMNS, FLIGHT_COLUMNS, HOTEL_COLUMNS, OfferCatalog
+from activity_optimizer import TEXT_FIELDS, activity_text, optimize_activities
+from keyword_index import KeywordIndex, terms
+from hotel_availability import HotelAvailability
+from quote_cache import QuoteCache
 
 
 class VacationRequest(Model):
@@ -9,6 +20,7 @@ class VacationRequest(Model):
     end_date: str
     budget: float
     preferences: str
+    allow_partial: bool = False  # Return a package with missing components instead of nothing
 
 
 class FlightInfo(Model):
@@ -35,10 +47,11 @@ class ActivitiesInfo(Model):
 
 class VacationPackage(Model):
     destination: str
-    flight: FlightInfo
-    hotel: HotelInfo
-    activities: ActivitiesInfo
+    flight: Optional[FlightInfo] = None
+    hotel: Optional[HotelInfo] = None
+    activities: Optional[ActivitiesInfo] = None
     total_cost: float
+    missing: list = []  # Components that could not be quoted (only with allow_partial)
 
 
 # Create agents for different services
@@ -48,7 +61,19 @@ flight_agent = Agent(name="flight_agent", seed="flight agent seed phrase", port=
 hotel_agent = Agent(name="hotel_agent", seed="hotel agent seed phrase", port=8013)
 activities_agent = Agent(name="activities_agent", seed="activities agent seed phrase", port=8014)
 
+# Most activities put into one package
+MAX_ACTIVITIES = 3
 
+# Activities handed to the optimizer per request: the cheapest ones, plus the best
+# preference matches from the keyword index
+CHEAPEST_CANDIDATES = 256
+MATCHED_CANDIDATES = 256
+
+# Shared deadline, in seconds, for the concurrent flight, hotel and activities lookups
+VACATION_QUOTE_DEADLINE = 15.0
+
+
+# Seed inventory, loaded into the price-indexed stores below
 # Simulated flight database
 FLIGHT_DB = {
     "Tokyo": [
@@ -84,29 +109,155 @@ HOTEL_DB = {
 # Simulated activities database
 ACTIVITIES_DB = {
     "Tokyo": [
-        {"name": "Tokyo Skytree Visit", "price": 25.0},
-        {"name": "Tsukiji Fish Market Tour", "price": 75.0},
-        {"name": "Sumo Wrestling Match", "price": 100.0},
-        {"name": "Mt. Fuji Day Trip", "price": 150.0},
-        {"name": "Robot Restaurant Show", "price": 80.0}
+        {"name": "Tokyo Skytree Visit", "price": 25.0, "tags": ["sightseeing", "views", "technology"]},
+        {"name": "Tsukiji Fish Market Tour", "price": 75.0, "tags": ["food", "market", "culture"]},
+        {"name": "Sumo Wrestling Match", "price": 100.0, "tags": ["sport", "culture", "tradition"]},
+        {"name": "Mt. Fuji Day Trip", "price": 150.0, "tags": ["nature", "hiking", "day trip"]},
+        {"name": "Robot Restaurant Show", "price": 80.0, "tags": ["technology", "entertainment", "nightlife"]}
     ],
     "Paris": [
-        {"name": "Eiffel Tower Skip-the-Line", "price": 60.0},
-        {"name": "Louvre Museum Guided Tour", "price": 65.0},
-        {"name": "Seine River Cruise", "price": 35.0},
-        {"name": "Montmartre Walking Tour", "price": 25.0},
-        {"name": "Versailles Palace Day Trip", "price": 90.0}
+        {"name": "Eiffel Tower Skip-the-Line", "price": 60.0, "tags": ["sightseeing", "views", "landmark"]},
+        {"name": "Louvre Museum Guided Tour", "price": 65.0, "tags": ["museums", "art", "culture", "history"]},
+        {"name": "Seine River Cruise", "price": 35.0, "tags": ["sightseeing", "romantic", "river"]},
+        {"name": "Montmartre Walking Tour", "price": 25.0, "tags": ["walking", "art", "history"]},
+        {"name": "Versailles Palace Day Trip", "price": 90.0, "tags": ["history", "architecture", "day trip"]}
     ],
     "Rome": [
-        {"name": "Colosseum & Roman Forum Tour", "price": 55.0},
-        {"name": "Vatican Museums & Sistine Chapel", "price": 70.0},
-        {"name": "Pasta Making Class", "price": 85.0},
-        {"name": "Trastevere Food Tour", "price": 95.0},
-        {"name": "Pompeii Day Trip", "price": 150.0}
+        {"name": "Colosseum & Roman Forum Tour", "price": 55.0, "tags": ["history", "architecture", "culture"]},
+        {"name": "Vatican Museums & Sistine Chapel", "price": 70.0, "tags": ["museums", "art", "religion", "culture"]},
+        {"name": "Pasta Making Class", "price": 85.0, "tags": ["food", "cooking", "hands-on"]},
+        {"name": "Trastevere Food Tour", "price": 95.0, "tags": ["food", "walking", "nightlife"]},
+        {"name": "Pompeii Day Trip", "price": 150.0, "tags": ["history", "archaeology", "day trip"]}
     ]
 }
 
 
+# Row layouts for the inventory stores (shared with the on-disk catalogs)
+FLIGHT_FIELDS = tuple(FLIGHT_COLUMNS)
+HOTEL_FIELDS = tuple(HOTEL_COLUMNS)
+ACTIVITY_FIELDS = tuple(ACTIVITY_COLUMNS)
+
+# Directory holding flights/, hotels/ and activities/ catalogs built with offer_catalog.py.
+# When set, the agents memory-map those catalogs instead of using the seed data above.
+VACATION_CATALOG_DIR = os.getenv("VACATION_CATALOG_DIR")
+
+if VACATION_CATALOG_DIR:
+    flight_store = OfferCatalog(os.path.join(VACATION_CATALOG_DIR, "flights"))
+    hotel_store = OfferCatalog(os.path.join(VACATION_CATALOG_DIR, "hotels"))
+    activity_store = OfferCatalog(os.path.join(VACATION_CATALOG_DIR, "activities"))
+else:
+    # Offers indexed by destination and kept sorted by price; they can be updated while running
+    flight_store = OfferStore.from_records(FLIGHT_DB, FLIGHT_FIELDS, price_field="price")
+    hotel_store = OfferStore.from_records(HOTEL_DB, HOTEL_FIELDS, price_field="price_per_night")
+    activity_store = OfferStore.from_records(ACTIVITIES_DB, ACTIVITY_FIELDS, price_field="price")
+
+
+# Activity names and tags indexed by term, filled per destination on first request and
+# kept in step with the store's change log one offer at a time
+activity_index = KeywordIndex()
+_indexed_activities = {}
+
+def index_activities(destination):
+    """Make sure activity_index matches the activities offered at a destination."""
+    version = activity_store.version(destination)
+    indexed = _indexed_activities.get(destination)
+    if indexed and indexed[0] == version:
+        return
+    changes = activity_store.changes_since(destination, indexed[0]) if indexed else None
+    if changes is None:
+        # First request, or too far behind the change log: index the destination afresh
+        for offer_id in indexed[1] if indexed else ():
+            activity_index.remove(destination, offer_id)
+        offer_ids = set()
+        for offer_id, activity in activity_store.offers(destination):
+            activity_index.add(destination, offer_id, activity_text(activity))
+            offer_ids.add(offer_id)
+        _indexed_activities[destination] = (version, offer_ids)
+        return
+    offer_ids = indexed[1]
+    for offer_id, fields in changes.items():
+        if fields is not None and not fields & TEXT_FIELDS:
+            # Price and other unmatched fields do not change what the activity matches
+            continue
+        try:
+            activity = activity_store.get(offer_id)
+        except KeyError:
+            activity_index.remove(destination, offer_id)
+            offer_ids.discard(offer_id)
+            continue
+        activity_index.add(destination, offer_id, activity_text(activity))
+        offer_ids.add(offer_id)
+    _indexed_activities[destination] = (version, offer_ids)
+
+
+# Nightly hotel availability and prices for the coming year, filled per city on first
+# request; stays outside the window are priced flat at price_per_night
+hotel_availability = HotelAvailability(date.today())
+_tracked_hotels = {}
+
+def track_hotels(destination):
+    """Make sure hotel_availability tracks exactly the hotels offered at a destination, at their store prices."""
+    version = hotel_store.version(destination)
+    tracked = _tracked_hotels.get(destination)
+    if tracked and tracked[0] == version:
+        return
+    offered = {offer_id: hotel["price_per_night"] for offer_id, hotel in hotel_store.offers(destination)}
+    for offer_id in (tracked[1] if tracked else set()) - offered.keys():
+        hotel_availability.remove_hotel(offer_id)
+    for offer_id, price_per_night in offered.items():
+        if offer_id not in hotel_availability:
+            hotel_availability.add_hotel(destination, offer_id, price_per_night)
+        elif hotel_availability.base_price(offer_id) != price_per_night:
+            # The store's price changed: the whole window is repriced at the new rate
+            hotel_availability.set_base_price(offer_id, price_per_night)
+    _tracked_hotels[destination] = (version, set(offered))
+
+
+def quote_hotel(destination, start_date, end_date):
+    """Pick the hotel for a stay; returns (hotel, price per night, total price, nights) or None.
+
+    Within the availability window this is the cheapest hotel free every night of the
+    stay, priced night by night; outside it, the cheapest hotel at its flat nightly price.
+    """
+    check_in = datetime.strptime(start_date, "%Y-%m-%d").date()
+    check_out = datetime.strptime(end_date, "%Y-%m-%d").date()
+    num_nights = (check_out - check_in).days
+    hotel_availability.advance(date.today())
+    if num_nights > 0 and hotel_availability.covers(check_in, check_out):
+        track_hotels(destination)
+        available = hotel_availability.available_hotels(destination, check_in, check_out)
+        if not available:
+            return None
+        offer_id, total_price = available[0]
+        return hotel_store.get(offer_id), round(total_price / num_nights, 2), total_price, num_nights
+    hotel = hotel_store.cheapest(destination)
+    if hotel is None:
+        return None
+    return hotel, hotel["price_per_night"], hotel["price_per_night"] * num_nights, num_nights
+
+
+# Complete packages already quoted, reused until the destination's inventory changes
+quote_cache = QuoteCache()
+
+def quote_key(msg):
+    """Cache key for a request: fields that change the quote, preferences reduced to their terms."""
+    return (
+        msg.destination.strip(),
+        msg.start_date,
+        msg.end_date,
+        round(msg.budget, 2),
+        tuple(sorted(terms(msg.preferences))),
+    )
+
+def inventory_stamp(destination):
+    """Versions of every inventory a destination's quote is built from."""
+    return (
+        flight_store.version(destination),
+        hotel_store.version(destination),
+        activity_store.version(destination),
+        hotel_availability.version(destination),
+    )
+
 @user_agent.on_interval(period=10.0)
 async def request_vacation(ctx: Context):
     # Only send one request
@@ -132,9 +283,14 @@ async def request_vacation(ctx: Context):
     if isinstance(reply, VacationPackage):
         ctx.storage.request_sent = True
         ctx.logger.info(f"Received vacation package for {reply.destination}:")
-        ctx.logger.info(f"Flight: {reply.flight.airline} {reply.flight.flight_number}")
-        ctx.logger.info(f"Hotel: {reply.hotel.name}")
-        ctx.logger.info(f"Activities: {json.dumps([a for a in reply.activities.activities], indent=2)}")
+        if reply.flight:
+            ctx.logger.info(f"Flight: {reply.flight.airline} {reply.flight.flight_number}")
+        if reply.hotel:
+            ctx.logger.info(f"Hotel: {reply.hotel.name}")
+        if reply.activities:
+            ctx.logger.info(f"Activities: {json.dumps([a for a in reply.activities.activities], indent=2)}")
+        if reply.missing:
+            ctx.logger.warning(f"Missing components: {', '.join(reply.missing)}")
         ctx.logger.info(f"Total cost: ${reply.total_cost:.2f}")
     else:
         ctx.logger.error(f"Failed to receive vacation package: {status}")
@@ -144,60 +300,81 @@ async def request_vacation(ctx: Context):
 async def handle_vacation_request(ctx: Context, sender: str, msg: VacationRequest):
     ctx.logger.info(f"Travel agent received vacation request for {msg.destination}")
     
-    # 1. Request flight information
-    ctx.logger.info("Travel agent is requesting flight information")
-    flight_reply, flight_status = await ctx.send_and_receive(
-        flight_agent.address,
-        msg,
-        response_type=FlightInfo
-    )
-    
-    if not isinstance(flight_reply, FlightInfo):
-        ctx.logger.error(f"Failed to get flight information: {flight_status}")
+    # Serve repeat requests from the quote cache while the destination's inventory is
+    # unchanged; the hotel calendar is brought up to date first so its version is current
+    hotel_availability.advance(date.today())
+    track_hotels(msg.destination)
+    key = quote_key(msg)
+    stamp = inventory_stamp(msg.destination)
+    cached_package = quote_cache.get(key, stamp)
+    if cached_package is not None:
+        ctx.logger.info(f"Travel agent is sending cached vacation package to user (total: ${cached_package.total_cost:.2f})")
+        await ctx.send(sender, cached_package)
         return
     
-    ctx.logger.info(f"Travel agent received flight information for {flight_reply.airline} {flight_reply.flight_number}")
-    
-    # 2. Request hotel information
-    ctx.logger.info("Travel agent is requesting hotel information")
-    hotel_reply, hotel_status = await ctx.send_and_receive(
-        hotel_agent.address,
-        msg,
-        response_type=HotelInfo
+    # 1. Request flight, hotel and activities information concurrently. Each lookup
+    # times out on its own at the deadline; none is cancelled, since cancelling a
+    # send_and_receive leaves its pending response registered with the dispatcher.
+    ctx.logger.info("Travel agent is requesting flight, hotel and activities information")
+    lookups = {
+        "flight": (flight_agent.address, FlightInfo),
+        "hotel": (hotel_agent.address, HotelInfo),
+        "activities": (activities_agent.address, ActivitiesInfo),
+    }
+    results = await asyncio.gather(
+        *(
+            ctx.send_and_receive(address, msg, response_type=response_type, timeout=VACATION_QUOTE_DEADLINE)
+            for address, response_type in lookups.values()
+        ),
+        return_exceptions=True,
     )
     
-    if not isinstance(hotel_reply, HotelInfo):
-        ctx.logger.error(f"Failed to get hotel information: {hotel_status}")
+    # 2. Collect the replies that arrived in time; a lookup that failed counts as missing
+    replies = {}
+    missing = []
+    for component, result in zip(lookups, results):
+        if isinstance(result, BaseException):
+            reply, status = None, f"lookup failed: {result!r}"
+        else:
+            reply, status = result
+        if isinstance(reply, lookups[component][1]):
+            replies[component] = reply
+        else:
+            ctx.logger.error(f"Failed to get {component} information: {status}")
+            missing.append(component)
+    
+    if missing and not msg.allow_partial:
         return
     
-    ctx.logger.info(f"Travel agent received hotel information for {hotel_reply.name}")
-    
-    # 3. Request activities information
-    ctx.logger.info("Travel agent is requesting activities information")
-    activities_reply, activities_status = await ctx.send_and_receive(
-        activities_agent.address,
-        msg,
-        response_type=ActivitiesInfo
+    flight_reply = replies.get("flight")
+    hotel_reply = replies.get("hotel")
+    activities_reply = replies.get("activities")
+    if flight_reply:
+        ctx.logger.info(f"Travel agent received flight information for {flight_reply.airline} {flight_reply.flight_number}")
+    if hotel_reply:
+        ctx.logger.info(f"Travel agent received hotel information for {hotel_reply.name}")
+    if activities_reply:
+        ctx.logger.info(f"Travel agent received activities information with {len(activities_reply.activities)} activities")
+    
+    # 3. Calculate total cost of the components we have and create vacation package
+    total_cost = (
+        (flight_reply.price if flight_reply else 0.0)
+        + (hotel_reply.total_price if hotel_reply else 0.0)
+        + (activities_reply.total_price if activities_reply else 0.0)
     )
     
-    if not isinstance(activities_reply, ActivitiesInfo):
-        ctx.logger.error(f"Failed to get activities information: {activities_status}")
-        return
-    
-    ctx.logger.info(f"Travel agent received activities information with {len(activities_reply.activities)} activities")
-    
-    # 4. Calculate total cost and create vacation package
-    total_cost = flight_reply.price + hotel_reply.total_price + activities_reply.total_price
-    
     vacation_package = VacationPackage(
         destination=msg.destination,
         flight=flight_reply,
         hotel=hotel_reply,
         activities=activities_reply,
-        total_cost=total_cost
+        total_cost=total_cost,
+        missing=missing
     )
+    if not missing:
+        quote_cache.put(key, stamp, vacation_package)
     
-    # 5. Send vacation package back to the user
+    # 4. Send vacation package back to the user
     ctx.logger.info(f"Travel agent is sending complete vacation package to user (total: ${total_cost:.2f})")
     await ctx.send(sender, vacation_package)
 
@@ -206,16 +383,13 @@ async def handle_vacation_request(ctx: Context, sender: str, msg: VacationReques
 async def handle_flight_request(ctx: Context, sender: str, msg: VacationRequest):
     ctx.logger.info(f"Flight agent received request for flights to {msg.destination}")
     
-    # Find available flights for the destination
-    available_flights = FLIGHT_DB.get(msg.destination, [])
+    # Select the cheapest flight for the destination
+    cheapest_flight = flight_store.cheapest(msg.destination)
     
-    if not available_flights:
+    if cheapest_flight is None:
         ctx.logger.error(f"No flights found for {msg.destination}")
         return
     
-    # Select the cheapest flight
-    cheapest_flight = min(available_flights, key=lambda x: x["price"])
-    
     flight_info = FlightInfo(
         airline=cheapest_flight["airline"],
         flight_number=cheapest_flight["flight_number"],
@@ -232,29 +406,18 @@ async def handle_flight_request(ctx: Context, sender: str, msg: VacationRequest)
 async def handle_hotel_request(ctx: Context, sender: str, msg: VacationRequest):
     ctx.logger.info(f"Hotel agent received request for hotels in {msg.destination}")
     
-    # Find available hotels for the destination
-    available_hotels = HOTEL_DB.get(msg.destination, [])
-    
-    if not available_hotels:
-        ctx.logger.error(f"No hotels found for {msg.destination}")
+    hotel_quote = quote_hotel(msg.destination, msg.start_date, msg.end_date)
+    if hotel_quote is None:
+        ctx.logger.error(f"No hotels available in {msg.destination} from {msg.start_date} to {msg.end_date}")
         return
-    
-    # Select the cheapest hotel
-    cheapest_hotel = min(available_hotels, key=lambda x: x["price_per_night"])
-    
-    # Calculate number of nights
-    start_date = datetime.strptime(msg.start_date, "%Y-%m-%d")
-    end_date = datetime.strptime(msg.end_date, "%Y-%m-%d")
-    num_nights = (end_date - start_date).days
-    
-    total_price = cheapest_hotel["price_per_night"] * num_nights
+    hotel, price_per_night, total_price, num_nights = hotel_quote
     
     hotel_info = HotelInfo(
-        name=cheapest_hotel["name"],
-        address=cheapest_hotel["address"],
+        name=hotel["name"],
+        address=hotel["address"],
         check_in=msg.start_date,
         check_out=msg.end_date,
-        price_per_night=cheapest_hotel["price_per_night"],
+        price_per_night=price_per_night,
         total_price=total_price
     )
     
@@ -266,29 +429,46 @@ async def handle_hotel_request(ctx: Context, sender: str, msg: VacationRequest):
 async def handle_activities_request(ctx: Context, sender: str, msg: VacationRequest):
     ctx.logger.info(f"Activities agent received request for activities in {msg.destination}")
     
-    # Find available activities for the destination
-    available_activities = ACTIVITIES_DB.get(msg.destination, [])
-    
-    if not available_activities:
+    if not activity_store.count(msg.destination):
         ctx.logger.error(f"No activities found for {msg.destination}")
         return
     
-    # Select activities based on budget and preferences
-    preferences_keywords = [kw.strip().lower() for kw in msg.preferences.split(",")]
-    selected_activities = []
-    total_price = 0.0
-    
-    # Select up to 3 activities
-    for activity in available_activities[:3]:
-        selected_activities.append(activity)
-        total_price += activity["price"]
+    # What is left of the budget after the flight and hotel the other agents will pick,
+    # with the hotel priced exactly as the hotel agent prices it
+    cheapest_flight = flight_store.cheapest(msg.destination)
+    hotel_quote = quote_hotel(msg.destination, msg.start_date, msg.end_date)
+    remaining_budget = msg.budget
+    if cheapest_flight:
+        remaining_budget -= cheapest_flight["price"]
+    if hotel_quote:
+        remaining_budget -= hotel_quote[2]
+    remaining_budget = max(remaining_budget, 0.0)
+    
+    # Candidates are the best preference matches from the index plus the cheapest
+    # activities, so a request costs the same however large the catalogue is
+    index_activities(msg.destination)
+    matches = activity_index.matches(msg.destination, msg.preferences)
+    candidates = dict(itertools.islice(activity_store.offers(msg.destination, remaining_budget), CHEAPEST_CANDIDATES))
+    for offer_id in heapq.nlargest(MATCHED_CANDIDATES, matches, key=matches.__getitem__):
+        if offer_id not in candidates:
+            candidates[offer_id] = activity_store.get(offer_id)
+    
+    # Select the activities that best match within the remaining budget, in catalogue
+    # (offer id) order
+    offer_ids = sorted(candidates)
+    selected_activities = optimize_activities(
+        [candidates[offer_id] for offer_id in offer_ids], remaining_budget, msg.preferences,
+        max_activities=MAX_ACTIVITIES,
+        match_counts={position: matches[offer_id] for position, offer_id in enumerate(offer_ids) if offer_id in matches},
+    )
+    total_price = sum(activity["price"] for activity in selected_activities)
     
     activities_info = ActivitiesInfo(
         activities=selected_activities,
         total_price=total_price
     )
     
-    ctx.logger.info(f"Activities agent found {len(selected_activities)} activities (total: ${total_price:.2f})")
+    ctx.logger.info(f"Activities agent found {len(selected_activities)} activities (total: ${total_price:.2f} of ${remaining_budget:.2f} left)")
     await ctx.send(sender, activities_info)
 
 
@@ -1,4 +1,5 @@
 from uagents import Agent, Context, Model
+from payload_codec import enable_compact_payloads, reply
 
 class WeatherRequest(Model):
     destination: str
@@ -40,7 +41,10 @@ async def handle_weather_request(ctx: Context, sender: str, msg: WeatherRequest)
         clothing_suggestions=weather_data["clothing_suggestions"]
     )
     
-    await ctx.send(sender, response)
+    await reply(ctx, sender, response)
+
+# Accept WeatherRequest as a compact payload from peers that negotiate it
+enable_compact_payloads(weather_agent, {WeatherRequest: handle_weather_request})
 
 def get_simulated_weather(destination, start_date, end_date):
     """Simulate weather data for a given destination."""